@@ -0,0 +1,431 @@
+# aggregates.py
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+# --- Dimensions counted per Library × Type of Transaction ---
+CUBE_DIMENSIONS = [
+    "Media Type", "Genre", "Target Group", "Gender",
+    "Age Group", "User Group", "Month",
+]
+
+# --- Dimensions with a chart in elements.make_*_chart ---
+CHART_DIMENSIONS = CUBE_DIMENSIONS + ["Library"]
+
+
+def _codes(col: pd.Series):
+    """Integer codes (-1 for missing) and levels of a column, categorical or not."""
+    if isinstance(col.dtype, pd.CategoricalDtype):
+        return col.cat.codes.to_numpy(), col.cat.categories
+    codes, levels = pd.factorize(col, sort=True)
+    return codes, pd.Index(levels)
+
+
+def _levels_index(levels, col: pd.Series, name: str):
+    """Keep the categorical dtype (and its order) on result labels."""
+    if isinstance(col.dtype, pd.CategoricalDtype):
+        return pd.CategoricalIndex(levels, dtype=col.dtype, name=name)
+    return pd.Index(levels, name=name)
+
+
+def build_count_cube(cleaned_df: pd.DataFrame) -> dict:
+    """Count rows once per Library × Type of Transaction × dimension.
+
+    Returns a dict with the years present, a "Library" Series of totals indexed
+    by (Library, Type of Transaction), and one table per dimension indexed the
+    same way with the dimension's categories as columns. Every table is a single
+    bincount over the combined codes.
+    """
+    lib_codes, libs = _codes(cleaned_df["Library"])
+    trans_codes, transactions = _codes(cleaned_df["Type of Transaction"])
+    valid = (lib_codes >= 0) & (trans_codes >= 0)
+    keys = lib_codes.astype("int64") * len(transactions) + trans_codes
+    index = pd.MultiIndex.from_product(
+        [_levels_index(libs, cleaned_df["Library"], "Library"), transactions],
+        names=["Library", "Type of Transaction"],
+    )
+
+    totals = pd.Series(np.bincount(keys[valid], minlength=len(index)), index=index)
+    observed = totals.to_numpy() > 0
+    cube = {
+        "Year": sorted(cleaned_df["Year"].unique().tolist()),
+        "Library": totals[observed],
+    }
+    for dim in CUBE_DIMENSIONS:
+        dim_codes, levels = _codes(cleaned_df[dim])
+        mask = valid & (dim_codes >= 0)
+        flat = keys[mask] * len(levels) + dim_codes[mask]
+        bins = np.bincount(flat, minlength=len(index) * len(levels))
+        table = pd.DataFrame(
+            bins.reshape(len(index), len(levels)),
+            index=index,
+            columns=_levels_index(levels, cleaned_df[dim], dim),
+        )
+        cube[dim] = table[observed]
+    return cube
+
+
+def cube_libraries(cube: dict) -> list:
+    """Libraries present in the cube, sorted by name."""
+    return sorted(cube["Library"].index.get_level_values("Library").unique().tolist())
+
+
+def cube_slice(cube: dict, dimension: str, libraries: list, transaction: str = "A"):
+    """Rows of one cube table for the selected libraries and transaction type."""
+    table = cube[dimension]
+    mask = (
+        table.index.get_level_values("Library").isin(libraries)
+        & (table.index.get_level_values("Type of Transaction") == transaction)
+    )
+    return table[mask]
+
+
+def cube_counts(cube: dict, dimension: str, libraries: list, transaction: str = "A") -> pd.DataFrame:
+    """Ready-to-chart [dimension, Count] frame read from the cube."""
+    rows = cube_slice(cube, dimension, libraries, transaction)
+    if dimension == "Library":
+        counts = rows.groupby(level="Library", observed=True).sum()
+    else:
+        counts = rows.sum()
+    counts = counts[counts > 0].astype("int64")
+    return counts.rename_axis(dimension).reset_index(name="Count")
+
+
+def cube_total(cube: dict, libraries: list, transaction: str) -> int:
+    """Number of transactions of one type for the selected libraries."""
+    return int(cube_slice(cube, "Library", libraries, transaction).sum())
+
+
+def merge_cubes(cube: dict, delta: dict) -> dict:
+    """Cube of two disjoint sets of rows, e.g. a year and its appended month.
+
+    Only the small cube tables are added up; categories new in `delta` become
+    new rows or columns.
+    """
+    merged = {
+        "Year": sorted(set(cube["Year"]) | set(delta["Year"])),
+        "Library": cube["Library"].add(delta["Library"], fill_value=0).astype("int64"),
+    }
+    for dim in CUBE_DIMENSIONS:
+        merged[dim] = cube[dim].add(delta[dim], fill_value=0).fillna(0).astype("int64")
+    return merged
+
+
+# --- Year-over-year comparison across per-year cubes ---
+def year_over_year(cubes: dict, dimension: str, libraries: list, transaction: str = "A") -> pd.DataFrame:
+    """Counts of one dimension per year with changes against the previous year.
+
+    `cubes` maps year to its count cube; only the cubes are combined, never rows.
+    Columns: dimension, Year, Count, Relative (share within the year), Change
+    and Change % (NaN for the first year or a level new in that year).
+    """
+    years = sorted(cubes)
+    wide = pd.concat(
+        {
+            year: cube_counts(cubes[year], dimension, libraries, transaction)
+            .astype({dimension: str})
+            .set_index(dimension)["Count"]
+            for year in years
+        },
+        axis=1,
+    ).reindex(columns=years).fillna(0).astype("int64")
+    wide.index.name = dimension
+
+    change = wide.diff(axis=1)
+    previous = wide.shift(1, axis=1)
+    change_pct = change / previous.where(previous > 0)
+    share = wide / wide.sum().where(wide.sum() > 0)
+
+    long = pd.DataFrame({
+        "Count": wide.stack(),
+        "Relative": share.stack(),
+        "Change": change.stack(),
+        "Change %": change_pct.stack(),
+    }).rename_axis([dimension, "Year"]).reset_index()
+    long["Year"] = long["Year"].astype(str)
+    return long
+
+
+def year_over_year_totals(cubes: dict, libraries: list) -> pd.DataFrame:
+    """Borrowings and renewals per year, with changes against the previous year."""
+    totals = pd.DataFrame(
+        {
+            "Borrowings": [cube_total(cubes[year], libraries, "A") for year in sorted(cubes)],
+            "Renewals": [cube_total(cubes[year], libraries, "T") for year in sorted(cubes)],
+        },
+        index=pd.Index(sorted(cubes), name="Year"),
+    )
+    for col in ["Borrowings", "Renewals"]:
+        previous = totals[col].shift(1)
+        totals[f"{col} Change %"] = (totals[col] - previous) / previous.where(previous > 0)
+    return totals
+
+
+# --- Top-N index for titles and authors ---
+TOP_MEDIA_TYPES = ["Book", "DVD", "CD"]
+
+
+def _plain(level: pd.Index) -> pd.Index:
+    if isinstance(level, pd.CategoricalIndex):
+        return level.astype(level.categories.dtype)
+    return level
+
+
+def _plain_labels(counts: pd.Series) -> pd.Series:
+    """Counts with categorical index levels turned into plain labels.
+
+    Done once before splitting per library, so all lists share the same levels
+    and merge_top aligns them without recoding.
+    """
+    index = counts.index
+    if isinstance(index, pd.MultiIndex):
+        index = index.set_levels([_plain(level) for level in index.levels])
+    else:
+        index = _plain(index)
+    return counts.set_axis(index)
+
+
+def _sorted_counts(counts: pd.Series) -> pd.Series:
+    """Counts in descending order, ties kept in label order."""
+    return counts.sort_index().sort_values(ascending=False, kind="stable")
+
+
+def build_top_index(cleaned_df: pd.DataFrame, media_types: list = TOP_MEDIA_TYPES) -> dict:
+    """Borrow counts per library, sorted once at load time.
+
+    "titles" maps (library, media type) to a Series indexed by (Title, Author),
+    "authors" maps library to a Series indexed by Author; both in descending
+    order, so a single library's top list is just its head.
+    """
+    borrowings = cleaned_df[cleaned_df["Type of Transaction"] == "A"]
+    index = {"titles": {}, "authors": {}}
+
+    books = borrowings[borrowings["Media Type"].isin(media_types)]
+    title_counts = _plain_labels(books.groupby(
+        ["Library", "Media Type", "Title", "Author"], observed=True
+    ).size())
+    for (library, media_type), counts in title_counts.groupby(level=[0, 1], observed=True):
+        index["titles"][(library, media_type)] = _sorted_counts(counts.droplevel([0, 1]))
+
+    author_counts = _plain_labels(borrowings.groupby(["Library", "Author"], observed=True).size())
+    for library, counts in author_counts.groupby(level=0, observed=True):
+        index["authors"][library] = _sorted_counts(counts.droplevel(0))
+    return index
+
+
+def _extend_level(level: pd.Index, new: pd.Index) -> tuple:
+    """Sorted union of two levels and where the labels of each ended up in it.
+
+    Kept sorted so merged lists index as fast as freshly built ones.
+    """
+    extended = level.append(new.difference(level)).sort_values()
+    return extended, extended.get_indexer(level), extended.get_indexer(new)
+
+
+def _merge_counts(counts: pd.Series, delta: pd.Series, levels: dict) -> pd.Series:
+    """Sorted sum of two count lists, like _sorted_counts(counts.add(delta)).
+
+    Works on integer codes: the extended levels are built once for all lists
+    that share them (via `levels`), so per list only codes are remapped and
+    sorted with numpy instead of re-aligning the labels of both lists.
+    """
+    if not isinstance(counts.index, pd.MultiIndex):
+        positions = counts.index.get_indexer(delta.index)
+        found = positions >= 0
+        values = counts.to_numpy().copy()
+        np.add.at(values, positions[found], delta.to_numpy()[found])
+        index = counts.index.append(delta.index[~found])
+        merged = pd.Series(np.append(values, delta.to_numpy()[~found]), index=index)
+        return _sorted_counts(merged.rename(counts.name))
+
+    extended = []
+    for level, new in zip(counts.index.levels, delta.index.levels):
+        # lists split from one frame have equal levels over the same buffers,
+        # so this comparison is cheap and each level is extended once
+        cached = next(
+            (ext for old, add, ext in levels[level.name] if old.equals(level) and add.equals(new)),
+            None,
+        )
+        if cached is None:
+            cached = _extend_level(level, new)
+            levels[level.name].append((level, new, cached))
+        extended.append(cached)
+    old_codes = [
+        np.where(c >= 0, moved[np.maximum(c, 0)], -1)
+        for c, (_, moved, _) in zip(counts.index.codes, extended)
+    ]
+    new_codes = [
+        np.where(c >= 0, moved[np.maximum(c, 0)], -1)
+        for c, (_, _, moved) in zip(delta.index.codes, extended)
+    ]
+
+    def pair_keys(codes):
+        key = np.zeros(len(codes[0]), dtype=np.int64)
+        for c, (level, _, _) in zip(codes, extended):
+            key = key * (len(level) + 1) + (c + 1)
+        return key
+
+    positions = pd.Index(pair_keys(old_codes)).get_indexer(pair_keys(new_codes))
+    found = positions >= 0
+    values = counts.to_numpy().astype(np.int64)
+    values[positions[found]] += delta.to_numpy()[found]
+    values = np.append(values, delta.to_numpy()[~found])
+    codes = [np.append(o, n[~found]) for o, n in zip(old_codes, new_codes)]
+
+    # descending counts, ties in label order with missing labels last
+    # (the last lexsort key is the primary one)
+    order = np.lexsort(
+        [np.where(c >= 0, c, len(level)) for c, (level, _, _) in zip(codes, extended)][::-1]
+        + [-values]
+    )
+    index = pd.MultiIndex(
+        levels=[level for level, _, _ in extended], codes=[c[order] for c in codes],
+        names=counts.index.names, verify_integrity=False,
+    )
+    return pd.Series(values[order], index=index, name=counts.name)
+
+
+def merge_top_indexes(top_index: dict, delta: dict) -> dict:
+    """Top-N index of two disjoint sets of rows, lists re-sorted where they changed."""
+    merged = {}
+    levels = defaultdict(list)  # extended levels, computed once for all lists that share them
+    for part in ["titles", "authors"]:
+        tables = dict(top_index[part])
+        for key, counts in delta[part].items():
+            if key in tables:
+                counts = _merge_counts(tables[key], counts, levels)
+            tables[key] = counts
+        merged[part] = tables
+    return merged
+
+
+def merge_top(tables: list, n: int = 5) -> pd.Series:
+    """Exact top n of the summed per-library counts, reading only list heads.
+
+    Threshold merge: candidates come from the first `depth` entries of each
+    sorted list; any other item scores at most the sum of the next entry of
+    every list, so once the n-th candidate exceeds that bound the answer is final.
+    An unread item could still tie the bound and win on label order, so a tie
+    reads deeper; shorter lists are therefore prefixes of longer ones.
+    """
+    tables = [t for t in tables if len(t)]
+    if not tables:
+        return pd.Series(dtype="int64")
+    if len(tables) == 1:
+        return tables[0].head(n)
+
+    depth = n
+    while True:
+        candidates = tables[0].index[:depth].append(
+            [t.index[:depth] for t in tables[1:]]
+        ).unique()
+        scores = sum(t.reindex(candidates, fill_value=0) for t in tables)
+        best = _sorted_counts(scores).head(n)
+        threshold = sum(int(t.iloc[depth]) for t in tables if len(t) > depth)
+        exhausted = all(len(t) <= depth for t in tables)
+        if exhausted or (len(best) == n and int(best.iloc[-1]) > threshold):
+            return best
+        depth *= 4
+
+
+def top_titles(top_index: dict, libraries: list, media_type: str, n: int = 5) -> pd.Series:
+    """Top n (Title, Author) borrow counts of one media type for the selected libraries."""
+    tables = [
+        top_index["titles"][(library, media_type)]
+        for library in libraries
+        if (library, media_type) in top_index["titles"]
+    ]
+    return merge_top(tables, n)
+
+
+def top_authors(top_index: dict, libraries: list, n: int = 5) -> pd.Series:
+    """Top n Author borrow counts for the selected libraries."""
+    tables = [top_index["authors"][lib] for lib in libraries if lib in top_index["authors"]]
+    return merge_top(tables, n)
+
+
+# --- Row index over frames sorted by data_loader.SORT_KEYS ---
+def build_row_index(cleaned_df: pd.DataFrame) -> dict:
+    """[(start, stop)] row offsets per (Library, Type of Transaction) block.
+
+    A block gets one more span for every appended month (see append_row_index).
+    """
+    groups = cleaned_df.groupby(
+        ["Library", "Type of Transaction"], observed=True, sort=False
+    ).indices
+    row_index = {}
+    for key, positions in groups.items():
+        start, stop = int(positions[0]), int(positions[-1]) + 1
+        if stop - start != len(positions):
+            raise ValueError(f"Rows of {key} are not contiguous, sort by SORT_KEYS first")
+        row_index[key] = [(start, stop)]
+    return row_index
+
+
+def append_row_index(row_index: dict, part_index: dict, offset: int) -> dict:
+    """Row index after appending a part indexed by `part_index` at row `offset`."""
+    merged = {key: list(spans) for key, spans in row_index.items()}
+    for key, spans in part_index.items():
+        merged.setdefault(key, []).extend(
+            (start + offset, stop + offset) for start, stop in spans
+        )
+    return merged
+
+
+def row_ranges(row_index: dict, libraries: list, transaction: str = None) -> list:
+    """Sorted, merged (start, stop) ranges of the selected rows."""
+    ranges = sorted(
+        span for (library, trans), spans in row_index.items()
+        if library in libraries and (transaction is None or trans == transaction)
+        for span in spans
+    )
+    merged = []
+    for start, stop in ranges:
+        if merged and merged[-1][1] == start:
+            merged[-1] = (merged[-1][0], stop)
+        else:
+            merged.append((start, stop))
+    return merged
+
+
+def select_rows(cleaned_df: pd.DataFrame, row_index: dict, libraries: list,
+                transaction: str = None) -> pd.DataFrame:
+    """Rows of the selected libraries (and transaction type) by offset.
+
+    A contiguous selection is a zero-copy iloc slice; otherwise only the
+    selected blocks are concatenated.
+    """
+    ranges = row_ranges(row_index, libraries, transaction)
+    if not ranges:
+        return cleaned_df.iloc[0:0]
+    if len(ranges) == 1:
+        start, stop = ranges[0]
+        return cleaned_df.iloc[start:stop]
+    return pd.concat([cleaned_df.iloc[start:stop] for start, stop in ranges])
+
+
+def sample_rows(cleaned_df: pd.DataFrame, ranges: list, n: int = 50,
+                required: list = None, rng=None) -> pd.DataFrame:
+    """Up to n random rows from the given (start, stop) ranges, in random order.
+
+    Only the drawn positions are materialized. Rows missing a value in one of
+    the `required` columns are rejected; the draw is repeated with a larger
+    sample until n rows qualify or every row has been drawn.
+    """
+    rng = np.random.default_rng(rng)
+    starts = np.array([start for start, _ in ranges], dtype="int64")
+    lengths = np.array([stop - start for start, stop in ranges], dtype="int64")
+    total = int(lengths.sum())
+    offsets = np.cumsum(lengths) - lengths
+
+    size = min(total, 2 * n)
+    while True:
+        draws = rng.choice(total, size=size, replace=False) if size else np.empty(0, "int64")
+        block = np.searchsorted(offsets, draws, side="right") - 1
+        rows = cleaned_df.take(starts[block] + (draws - offsets[block]))
+        if required:
+            rows = rows.dropna(subset=required)
+        if len(rows) >= n or size == total:
+            return rows.head(n)
+        size = min(total, size * 4)
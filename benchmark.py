@@ -0,0 +1,144 @@
+# benchmark.py
+import argparse
+import json
+import os
+import platform
+import time
+import tracemalloc
+
+import aggregates as ag
+import elements as el
+from data_loader import clean_data, load_and_clean_multiple, load_raw
+from synthetic_data import write_synthetic
+
+BENCH_DIR = ".cache/bench"
+BASELINE = "benchmark_baseline.json"
+SIZES = [1_000_000, 10_000_000]
+YEAR = 2024
+
+# a run counts as a regression when it is this much slower than the baseline
+TOLERANCE = 1.25
+
+
+def measure(fn, *args, repeat: int = 3):
+    """Best wall time over `repeat` runs and peak traced memory of one run.
+
+    tracemalloc sees Python and NumPy allocations; Arrow buffers are not traced.
+    """
+    tracemalloc.start()
+    result = fn(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return result, {"seconds": round(best, 6), "peak_mb": round(peak / 1024**2, 2)}
+
+
+def run_size(rows: int, bench_dir: str = BENCH_DIR, repeat: int = 3) -> dict:
+    """Time every stage of a dashboard rerun on `rows` synthetic rows."""
+    path = os.path.join(bench_dir, f"synthetic_{rows}.parquet")
+    if not os.path.exists(path):
+        write_synthetic(path, rows)
+
+    stages = {}
+    raw, stages["load_raw"] = measure(load_raw, path, YEAR, repeat=1)
+    _, stages["clean_data"] = measure(clean_data, raw, YEAR, repeat=1)
+    del raw
+    df, stages["load_and_clean_multiple"] = measure(
+        load_and_clean_multiple, {YEAR: [path]}, repeat=1
+    )
+
+    cube, stages["build_count_cube"] = measure(ag.build_count_cube, df, repeat=repeat)
+    top_index, stages["build_top_index"] = measure(ag.build_top_index, df, repeat=1)
+    row_index, stages["build_row_index"] = measure(ag.build_row_index, df, repeat=repeat)
+
+    libraries = ag.cube_libraries(cube)
+    one = libraries[:1]
+    borrowings, stages["filter_mask_one_library"] = measure(
+        lambda: df[df["Library"].isin(one) & (df["Type of Transaction"] == "A")],
+        repeat=repeat,
+    )
+    _, stages["filter_offsets_one_library"] = measure(
+        ag.select_rows, df, row_index, one, "A", repeat=repeat
+    )
+    _, stages["preview_sample"] = measure(
+        el.make_preview, df, row_index, libraries, repeat=repeat
+    )
+    _, stages["make_lists_all"] = measure(el.make_lists, top_index, libraries, repeat=repeat)
+    _, stages["make_lists_one"] = measure(el.make_lists, top_index, one, repeat=repeat)
+    _, stages["cube_counts_one_library"] = measure(
+        lambda: [ag.cube_counts(cube, dim, one) for dim in ag.CHART_DIMENSIONS], repeat=repeat
+    )
+
+    def charts(libs):
+        return [
+            el.make_media_chart(ag.cube_counts(cube, "Media Type", libs)),
+            el.make_genre_chart(ag.cube_counts(cube, "Genre", libs)),
+            el.make_target_chart(ag.cube_counts(cube, "Target Group", libs)),
+            el.make_gender_chart(ag.cube_counts(cube, "Gender", libs)),
+            el.make_age_chart(ag.cube_counts(cube, "Age Group", libs)),
+            el.make_user_chart(ag.cube_counts(cube, "User Group", libs)),
+            el.make_library_chart(ag.cube_counts(cube, "Library", libs)),
+            el.make_month_chart(ag.cube_counts(cube, "Month", libs)),
+        ]
+
+    _, stages["charts_all"] = measure(charts, libraries, repeat=repeat)
+    _, stages["kpis_all"] = measure(el.show_kpis, cube, libraries, repeat=repeat)
+    return {"rows": rows, "cleaned_rows": len(df), "stages": stages}
+
+
+def compare(results: dict, baseline: dict, tolerance: float = TOLERANCE) -> list:
+    """Stages slower than baseline × tolerance, as printable lines."""
+    regressions = []
+    for size, run in results["sizes"].items():
+        base_run = baseline.get("sizes", {}).get(size)
+        if not base_run:
+            continue
+        for stage, stats in run["stages"].items():
+            base = base_run["stages"].get(stage)
+            if base and stats["seconds"] > base["seconds"] * tolerance:
+                ratio = stats["seconds"] / base["seconds"]
+                regressions.append(f"{size} rows · {stage}: {ratio:.2f}× slower")
+    return regressions
+
+
+def print_results(results: dict):
+    for size, run in results["sizes"].items():
+        print(f"\n{int(size):,} rows ({run['cleaned_rows']:,} after cleaning)")
+        for stage, stats in run["stages"].items():
+            print(f"   {stage:<32} {stats['seconds'] * 1000:>10.2f} ms {stats['peak_mb']:>10.1f} MB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark loader, filters and charts on synthetic data.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--bench-dir", default=BENCH_DIR)
+    parser.add_argument("--save-baseline", action="store_true", help="write results to --baseline")
+    parser.add_argument("--baseline", default=BASELINE)
+    args = parser.parse_args()
+
+    results = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "sizes": {str(rows): run_size(rows, args.bench_dir, args.repeat) for rows in args.sizes},
+    }
+    print_results(results)
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n✅ Saved baseline: {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f))
+        if regressions:
+            print("\n❌ Regressions against baseline:")
+            for line in regressions:
+                print(f"   {line}")
+            raise SystemExit(1)
+        print("\n✅ No regressions against baseline")
@@ -1,5 +1,13 @@
 # data_loader.py
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
 import pandas as pd
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
 
 # --- Dictionaries for translations ---
 RENAME_COLS = {
@@ -77,16 +85,80 @@ MONTH_NAME_MAP = {
 }
 MONTH_ORDER = list(MONTH_NAME_MAP.values())
 
+def month_labels(months) -> pd.Categorical:
+    """Month names for month numbers 1-12 (cleaned data keeps the numbers)."""
+    codes = np.asarray(months, dtype="int64") - 1
+    codes = np.where((codes >= 0) & (codes < len(MONTH_ORDER)), codes, -1)
+    return pd.Categorical.from_codes(codes, categories=MONTH_ORDER, ordered=True)
+
 AGE_ORDER = [
     "0-5", "6-10", "11-14", "15-17", "18-24",
     "25-39", "40-54", "55-64", "65-79", "80+",
 ]
 
+# --- Translation rules per cleaned column, applied by translate_column ---
+# "map": source code → label, codes not in it keep their name;
+# "categories": fixed, ordered labels, any other label becomes missing
+TRANSLATION_RULES = {
+    "Media Type":   {"map": MEDIA_TYPE_TRANSLATION},
+    "Gender":       {"map": GENDER_TRANSLATION},
+    "Genre":        {"map": GENRE_TRANSLATION},
+    "Target Group": {"map": TARGET_GROUP_TRANSLATION},
+    "User Group":   {"map": USER_GROUP_TRANSLATION},
+    "Library":      {"map": LIBRARIES},
+    "Age Group":    {"map": {"ab 80": "80+"}, "categories": AGE_ORDER},
+}
+
+logger = logging.getLogger(__name__)
+
+CATEGORY_COLS = [
+    "Media Type", "Gender", "Genre", "Age Group",
+    "Target Group", "User Group", "Library",
+]
+
+# --- Compact cleaned schema: strings dictionary-encoded, integers narrow ---
+# (transaction codes become int8 category codes, so == "A" compares codes)
+ENCODED_COLS = ["Type of Transaction", "Title", "Author"]
+MONTH_DTYPE = "int8"
+YEAR_DTYPE = "int16"
+
+# --- Physical row order of cleaned data (see aggregates.build_row_index) ---
+SORT_KEYS = ["Library", "Type of Transaction"]
+
+# --- Threads used to read and clean Parquet parts (pyarrow releases the GIL) ---
+LOAD_WORKERS = int(os.environ.get("LOAD_WORKERS", "4"))
+
+
+# --- Parquet read options ---
+EXCLUDED_MEDIA_TYPES = ["Nicht bestellbar", "Nicht entleihbar"]
+
+# source columns that become categories in clean_data, read as dictionaries
+DICTIONARY_COLS = [
+    "Medientypcode", "Geschlecht", "Fächerstatistik", "Altersgruppe",
+    "Fächerstatistik2", "Benutzergruppe", "Ausleihtyp", "Titel", "Autor:in",
+]
+
+# rows with a missing media type are kept, as in clean_data
+MEDIA_TYPE_FILTER = (
+    ~pc.field("Medientypcode").isin(EXCLUDED_MEDIA_TYPES)
+    | pc.field("Medientypcode").is_null()
+)
+
 
 def load_raw(path: str, year: int) -> pd.DataFrame:
-    """Load a Parquet file and add a Year column."""
-    df = pd.read_parquet(path)
-    df["Year"] = int(year)
+    """Load the RENAME_COLS columns of a Parquet file and add a Year column.
+
+    The column projection and the media type filter are pushed down into the
+    pyarrow reader, so unused columns and excluded rows are never decoded.
+    """
+    table = pq.read_table(
+        path,
+        columns=list(RENAME_COLS),
+        filters=MEDIA_TYPE_FILTER,
+        read_dictionary=DICTIONARY_COLS,
+    )
+    df = table.to_pandas()
+    df["Year"] = np.full(len(df), year, dtype=YEAR_DTYPE)
     return df
 
 def load_raw_multiple(files: dict) -> pd.DataFrame:
@@ -100,54 +172,196 @@ def load_raw_multiple(files: dict) -> pd.DataFrame:
             dfs.append(load_raw(paths, year))
     return pd.concat(dfs, ignore_index=True)
 
+def sort_dictionaries(df: pd.DataFrame) -> pd.DataFrame:
+    """Sort the categories of ENCODED_COLS, so code order is label order."""
+    for col in ENCODED_COLS:
+        categories = df[col].cat.categories
+        order = categories.argsort()
+        rank = np.empty(len(order), dtype="int64")
+        rank[order] = np.arange(len(order))
+        codes = df[col].cat.codes.to_numpy()
+        df[col] = pd.Categorical.from_codes(
+            np.where(codes >= 0, rank[codes], -1), categories=categories[order]
+        )
+    return df
+
+def translate_column(col: pd.Series, rule: dict):
+    """Translate a categorical column by one TRANSLATION_RULES entry.
+
+    Labels are looked up once per category. A one-to-one rule just renames
+    the categories; merged codes or fixed categories re-point the rows with a
+    single take over the code array. Returns the
+    translated column and the source codes the rule does not cover (kept
+    unchanged, or missing when the rule has fixed categories).
+    """
+    mapping = rule.get("map", {})
+    levels = col.cat.categories
+    labels = [mapping.get(code, code) for code in levels]
+    if "categories" in rule:
+        dtype = pd.CategoricalDtype(rule["categories"], ordered=True)
+        level_codes = dtype.categories.get_indexer(labels)
+        unmapped = levels[level_codes < 0]
+    else:
+        # codes that map to the same label merge into one category
+        dtype = pd.CategoricalDtype(list(dict.fromkeys(labels)))
+        level_codes = dtype.categories.get_indexer(labels)
+        known = set(mapping) | set(mapping.values())
+        unmapped = levels[[code not in known for code in levels]]
+
+    source_codes = col.cat.codes.to_numpy()
+    if len(unmapped):
+        # report only codes that occur (filtered rows leave unused categories)
+        used = np.bincount(source_codes[source_codes >= 0], minlength=len(levels)) > 0
+        unmapped = unmapped[used[levels.get_indexer(unmapped)]]
+
+    if len(dtype.categories) == len(levels) and not dtype.ordered:
+        # one label per code: renaming the categories is enough, rows untouched
+        return col.cat.rename_categories(labels), unmapped.tolist()
+
+    # code -1 (missing) picks the appended -1
+    lookup = np.append(level_codes, -1).astype(source_codes.dtype)
+    codes = lookup[source_codes]
+    translated = pd.Series(
+        pd.Categorical.from_codes(codes, dtype=dtype), index=col.index, name=col.name
+    )
+    return translated, unmapped.tolist()
+
+def translate_categories(df: pd.DataFrame, rules: dict = TRANSLATION_RULES) -> dict:
+    """Apply every rule to its (categorical) column in place.
+
+    Returns {column: unmapped source codes} for the columns that have any.
+    """
+    unmapped = {}
+    for col, rule in rules.items():
+        df[col], codes = translate_column(df[col], rule)
+        if codes:
+            unmapped[col] = codes
+    return unmapped
+
 def clean_data(raw: pd.DataFrame, year: int) -> pd.DataFrame:
     """Clean one year of raw data, keep both borrowings (A) and renewals (T)."""
     df = (
         raw.loc[
-            (raw["Medientypcode"] != "Nicht bestellbar") &
-            (raw["Medientypcode"] != "Nicht entleihbar"),
+            ~raw["Medientypcode"].isin(EXCLUDED_MEDIA_TYPES),
             RENAME_COLS.keys(),
         ]
         .rename(columns=RENAME_COLS)
     )
 
-    for col in [
-        "Media Type", "Gender", "Genre", "Age Group",
-        "Target Group", "User Group", "Library"
-    ]:
+    for col in CATEGORY_COLS + ENCODED_COLS:
         df[col] = df[col].astype("category")
 
-    df["Month"] = df["Month"].astype(int)
+    # month numbers stay int8; month_labels names them for charts and previews
+    df["Month"] = df["Month"].astype(MONTH_DTYPE)
 
-    df["Age Group"] = df["Age Group"].cat.rename_categories(
-        lambda x: "80+" if x == "ab 80" else x
-    )
-    df["Age Group"] = pd.Categorical(df["Age Group"], categories=AGE_ORDER, ordered=True)
+    # translations touch category levels only, never per-row values
+    for col, codes in translate_categories(df).items():
+        logger.warning("%s (%s): no translation for %s", col, year, codes)
 
-    df["Media Type"]   = df["Media Type"].cat.rename_categories(MEDIA_TYPE_TRANSLATION)
-    df["Gender"]       = df["Gender"].cat.rename_categories(GENDER_TRANSLATION)
-    df["Genre"]        = df["Genre"].cat.rename_categories(GENRE_TRANSLATION)
-    df["Target Group"] = df["Target Group"].cat.rename_categories(TARGET_GROUP_TRANSLATION)
-    df["User Group"]   = df["User Group"].cat.rename_categories(USER_GROUP_TRANSLATION)
-    df["Library"]      = df["Library"].cat.rename_categories(LIBRARIES)
+    df["Year"] = np.full(len(df), year, dtype=YEAR_DTYPE)
 
-    df["Month"] = df["Month"].map(MONTH_NAME_MAP)
-    df["Month"] = pd.Categorical(df["Month"], categories=MONTH_ORDER, ordered=True)
+    return sort_dictionaries(df)
 
-    df["Year"] = int(year)
+def concat_cleaned(frames: list) -> pd.DataFrame:
+    """Concatenate cleaned frames once, keeping categorical columns categorical.
 
-    return df
+    Parts can carry different category sets, which pd.concat would turn into
+    object columns, so every part is first aligned to the union of categories.
+    """
+    if len(frames) == 1:
+        return frames[0].reset_index(drop=True)
+    categories = {
+        col: list(dict.fromkeys(c for df in frames for c in df[col].cat.categories))
+        for col in CATEGORY_COLS
+    }
+    for col in ENCODED_COLS:
+        first, *rest = [df[col].cat.categories for df in frames]
+        categories[col] = first.append(rest).unique().sort_values()
+    aligned = [
+        df.assign(**{col: df[col].cat.set_categories(cats) for col, cats in categories.items()})
+        for df in frames
+    ]
+    return pd.concat(aligned, ignore_index=True)
 
-def load_and_clean_multiple(files: dict) -> pd.DataFrame:
-    """Load and clean multiple datasets, given {year: path(s)} mapping."""
-    cleaned_multiple_years = []
-    for year, paths in files.items():
-        raws = []
-        if isinstance(paths, list):
-            raws = [load_raw(path, year) for path in paths]
+def append_cleaned(base: pd.DataFrame, part: pd.DataFrame) -> pd.DataFrame:
+    """Rows of `part` after the rows of `base`, e.g. a new month of a year.
+
+    Categories new in the part are added after the existing ones, so the codes
+    of `base` stay valid as they are; only the part is recoded. Row order of
+    base is kept, so row offsets into it stay valid too.
+    """
+    columns = {}
+    for col in base.columns:
+        old, new = base[col], part[col]
+        if isinstance(old.dtype, pd.CategoricalDtype):
+            categories = old.cat.categories
+            categories = categories.append(new.cat.categories.difference(categories, sort=False))
+            lookup = np.append(categories.get_indexer(new.cat.categories), -1)
+            codes = np.concatenate([
+                old.cat.codes.to_numpy().astype(np.int64),
+                lookup[new.cat.codes.to_numpy()],
+            ])
+            columns[col] = pd.Categorical.from_codes(
+                codes, dtype=pd.CategoricalDtype(categories, ordered=old.cat.ordered)
+            )
         else:
-            raws = [load_raw(paths, year)]
-        raw = pd.concat(raws, ignore_index=True)
-        cleaned = clean_data(raw, year)
-        cleaned_multiple_years.append(cleaned)
-    return pd.concat(cleaned_multiple_years, ignore_index=True)
+            columns[col] = np.concatenate([old.to_numpy(), new.to_numpy().astype(old.dtype)])
+    return pd.DataFrame(columns)
+
+def load_and_clean_part(path: str, year: int) -> pd.DataFrame:
+    """Load and clean a single Parquet part of one year."""
+    return clean_data(load_raw(path, year), year)
+
+def load_and_clean_multiple(files: dict, max_workers: int = None) -> pd.DataFrame:
+    """Load and clean multiple datasets, given {year: path(s)} mapping.
+
+    All parts of all years are read and cleaned concurrently on a thread pool,
+    then concatenated once and sorted by SORT_KEYS, so every library and
+    transaction type occupies one contiguous block of rows.
+    """
+    jobs = []
+    for year, paths in files.items():
+        for path in (paths if isinstance(paths, list) else [paths]):
+            jobs.append((path, year))
+
+    with ThreadPoolExecutor(max_workers=max_workers or LOAD_WORKERS) as pool:
+        cleaned_parts = list(pool.map(lambda job: load_and_clean_part(*job), jobs))
+    cleaned = concat_cleaned(cleaned_parts)
+    return cleaned.sort_values(SORT_KEYS, kind="stable", ignore_index=True)
+
+def load_partitioned(dataset_dir: str, year: int, libraries: list = None) -> pd.DataFrame:
+    """Load cleaned rows from the Year=/Library= dataset written by ingest.py.
+
+    Only the partitions of the year (and libraries, if given) are read.
+    """
+    dataset = ds.dataset(
+        dataset_dir,
+        format="parquet",
+        partitioning=ds.partitioning(flavor="hive", dictionaries="infer"),
+    )
+    selection = ds.field("Year") == int(year)
+    if libraries is not None:
+        selection = selection & ds.field("Library").isin(list(libraries))
+    df = dataset.to_table(filter=selection).to_pandas()
+    df = df[list(RENAME_COLS.values()) + ["Year"]]
+
+    # partition columns and per-file dictionaries lose the cleaned dtypes
+    df["Year"] = df["Year"].astype(YEAR_DTYPE)
+    for col in CATEGORY_COLS + ENCODED_COLS:
+        df[col] = df[col].astype("category")
+    df["Age Group"] = df["Age Group"].cat.set_categories(AGE_ORDER, ordered=True)
+    df["Month"] = df["Month"].astype(MONTH_DTYPE)
+    df = sort_dictionaries(df)
+    return df.sort_values(SORT_KEYS, kind="stable", ignore_index=True)
+
+def memory_report(df: pd.DataFrame) -> pd.DataFrame:
+    """Memory per column (deep, dictionaries included), largest first."""
+    usage = df.memory_usage(deep=True, index=False)
+    report = pd.DataFrame({
+        "dtype": df.dtypes.astype(str),
+        "MB": (usage / 1024**2).round(2),
+        "bytes/row": (usage / max(len(df), 1)).round(2),
+        "share": (usage / max(usage.sum(), 1)).round(3),
+    })
+    report.index.name = "column"
+    return report.sort_values("MB", ascending=False)
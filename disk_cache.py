@@ -0,0 +1,87 @@
+# disk_cache.py
+import glob
+import hashlib
+import json
+import os
+import tempfile
+
+import pandas as pd
+import pyarrow as pa
+from data_loader import load_and_clean_multiple
+
+# Bump whenever clean_data or the translation dictionaries change,
+# so cached files written by older rules are rebuilt.
+CLEANING_VERSION = 3
+
+CACHE_DIR = os.environ.get("DATASET_CACHE_DIR", ".cache/cleaned")
+
+
+def cache_key(year: int, paths: list) -> str:
+    """Hash of the source files (path, size, mtime) and the cleaning rules version."""
+    sources = []
+    for path in paths:
+        stat = os.stat(path)
+        sources.append([os.path.abspath(path), stat.st_size, stat.st_mtime_ns])
+    payload = json.dumps([CLEANING_VERSION, int(year), sources])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def cache_path(year: int, paths: list, cache_dir: str = CACHE_DIR) -> str:
+    return os.path.join(cache_dir, f"pankow_{int(year)}_{cache_key(year, paths)}.arrow")
+
+
+def write_cleaned(df: pd.DataFrame, path: str):
+    """Write a cleaned frame as an uncompressed Arrow IPC file (atomic rename).
+
+    Every writer, thread or process, gets its own temporary file.
+    """
+    cache_dir = os.path.dirname(path) or "."
+    os.makedirs(cache_dir, exist_ok=True)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+    os.close(fd)
+    try:
+        with pa.OSFile(tmp_path, "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def read_cleaned(path: str) -> pd.DataFrame:
+    """Memory-map a cached Arrow IPC file and convert it back to pandas.
+
+    Plain numeric columns (Month, Year) stay zero-copy views of the map, so
+    worker processes reading the same file share those pages. Categorical
+    columns are still copied into process memory: pandas codes use -1 where
+    Arrow has a validity bitmap, and the dictionaries become pandas objects.
+    """
+    with pa.memory_map(path, "r") as source:
+        table = pa.ipc.open_file(source).read_all()
+    # one block per column keeps numeric columns zero-copy; self_destruct
+    # frees each Arrow column as soon as it is converted
+    return table.to_pandas(split_blocks=True, self_destruct=True)
+
+
+def load_and_clean_cached(year: int, paths: list, cache_dir: str = CACHE_DIR) -> pd.DataFrame:
+    """Load one year from the on-disk cache, rebuilding it when the sources changed."""
+    path = cache_path(year, paths, cache_dir)
+    if os.path.exists(path):
+        try:
+            return read_cleaned(path)
+        except (OSError, pa.ArrowInvalid):
+            pass  # truncated or unreadable file, rebuild below
+
+    df = load_and_clean_multiple({year: list(paths)})
+
+    # stale files for this year are replaced by the fresh one
+    for old in glob.glob(os.path.join(cache_dir, f"pankow_{int(year)}_*.arrow")):
+        if old != path:
+            try:
+                os.remove(old)
+            except FileNotFoundError:
+                pass  # another worker removed it first
+    write_cleaned(df, path)
+    return df
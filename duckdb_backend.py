@@ -0,0 +1,161 @@
+# duckdb_backend.py
+# Out-of-core engine: builds the count cube and top-N index of aggregates.py
+# with in-process DuckDB straight from the raw Parquet parts. Only grouped
+# results reach pandas, and the data_loader translation rules are applied to them.
+# Optional dependency: pip install duckdb
+import duckdb
+import numpy as np
+import pandas as pd
+
+from aggregates import CUBE_DIMENSIONS, TOP_MEDIA_TYPES, _sorted_counts
+from search import build_search_index_from_counts
+from data_loader import (
+    EXCLUDED_MEDIA_TYPES, LIBRARIES, MEDIA_TYPE_TRANSLATION, MONTH_DTYPE,
+    MONTH_NAME_MAP, RENAME_COLS, TRANSLATION_RULES, clean_data, month_labels,
+    translate_column,
+)
+
+SOURCE_COLS = {cleaned: raw for raw, cleaned in RENAME_COLS.items()}
+
+# month numbers stay numbers, as in clean_data
+MONTHS = list(MONTH_NAME_MAP)
+
+LIBRARY_CODES = {name: code for code, name in LIBRARIES.items()}
+
+
+def _q(col: str) -> str:
+    return '"' + col.replace('"', '""') + '"'
+
+
+def _source() -> str:
+    """FROM/WHERE clause over the raw parts, without the excluded media types."""
+    return (
+        "FROM read_parquet($paths) "
+        f"WHERE coalesce(NOT list_contains($excluded, {_q('Medientypcode')}), true)"
+    )
+
+
+def _query(sql: str, paths: list, **params) -> pd.DataFrame:
+    with duckdb.connect() as con:
+        return con.execute(
+            sql, {"paths": list(paths), "excluded": EXCLUDED_MEDIA_TYPES, **params}
+        ).df()
+
+
+def _translate(codes: pd.Series, dimension: str) -> pd.Series:
+    """Labels of grouped source codes, by the same rules as clean_data."""
+    if dimension == "Month":
+        return codes.where(codes.isin(MONTHS))
+    translated, _ = translate_column(codes.astype("category"), TRANSLATION_RULES[dimension])
+    return translated
+
+
+def build_count_cube(paths: list, year: int) -> dict:
+    """Count cube in the aggregates.build_count_cube layout, from one SQL scan."""
+    lib, trans = _q(SOURCE_COLS["Library"]), _q(SOURCE_COLS["Type of Transaction"])
+    dims = [_q(SOURCE_COLS[dim]) for dim in CUBE_DIMENSIONS]
+    sets = ", ".join(f"({lib}, {trans}, {d})" for d in dims) + f", ({lib}, {trans})"
+    grouping = ", ".join(f"grouping({d}) AS g{i}" for i, d in enumerate(dims))
+    counts = _query(
+        f"SELECT {lib} AS lib, {trans} AS trans, {', '.join(dims)}, {grouping}, "
+        f"count(*) AS n {_source()} AND {lib} IS NOT NULL AND {trans} IS NOT NULL "
+        f"GROUP BY GROUPING SETS ({sets})",
+        paths,
+    )
+    counts["Library"] = _translate(counts["lib"], "Library")
+    counts["Type of Transaction"] = counts["trans"]
+    keys = ["Library", "Type of Transaction"]
+    is_dim = np.column_stack([counts[f"g{i}"] == 0 for i in range(len(dims))])
+
+    totals = counts[~is_dim.any(axis=1)]
+    cube = {
+        "Year": [int(year)],
+        "Library": totals.set_index(keys)["n"].astype("int64").sort_index(),
+    }
+    for i, dim in enumerate(CUBE_DIMENSIONS):
+        rows = counts[is_dim[:, i]]
+        rows = rows.assign(**{dim: _translate(rows[SOURCE_COLS[dim]], dim)}).dropna(subset=[dim])
+        if dim == "Month":
+            rows = rows.astype({dim: MONTH_DTYPE})
+        cube[dim] = (
+            rows.groupby(keys + [dim], observed=True)["n"].sum()
+            .unstack(dim, fill_value=0)
+            .astype("int64")
+        )
+    return cube
+
+
+def build_top_index(paths: list, year: int, media_types: list = TOP_MEDIA_TYPES) -> dict:
+    """Top-N index in the aggregates.build_top_index layout, grouped by DuckDB."""
+    lib, media = _q(SOURCE_COLS["Library"]), _q(SOURCE_COLS["Media Type"])
+    title, author = _q(SOURCE_COLS["Title"]), _q(SOURCE_COLS["Author"])
+    trans = _q(SOURCE_COLS["Type of Transaction"])
+    raw_media = [code for code, label in MEDIA_TYPE_TRANSLATION.items() if label in media_types]
+    borrowings = f"{_source()} AND {trans} = 'A' AND {lib} IS NOT NULL AND {author} IS NOT NULL"
+
+    titles = _query(
+        f"SELECT {lib} AS lib, {media} AS media, {title} AS title, {author} AS author, "
+        f"count(*) AS n {borrowings} AND {title} IS NOT NULL "
+        f"AND list_contains($media, {media}) GROUP BY ALL",
+        paths, media=raw_media,
+    )
+    authors = _query(
+        f"SELECT {lib} AS lib, {author} AS author, count(*) AS n {borrowings} GROUP BY ALL",
+        paths,
+    )
+
+    index = {"titles": {}, "authors": {}}
+    titles["lib"] = _translate(titles["lib"], "Library")
+    titles["media"] = _translate(titles["media"], "Media Type")
+    for (library, media_type), rows in titles.groupby(["lib", "media"], observed=True):
+        counts = rows.set_index(["title", "author"])["n"].astype("int64")
+        index["titles"][(library, media_type)] = _sorted_counts(
+            counts.rename_axis(["Title", "Author"])
+        )
+    authors["lib"] = _translate(authors["lib"], "Library")
+    for library, rows in authors.groupby("lib", observed=True):
+        counts = rows.set_index("author")["n"].astype("int64").rename_axis("Author")
+        index["authors"][library] = _sorted_counts(counts)
+    return index
+
+
+def build_search_index(paths: list, year: int) -> dict:
+    """search.py index from (Title, Author, Library, Month) counts grouped by DuckDB."""
+    lib, month = _q(SOURCE_COLS["Library"]), _q(SOURCE_COLS["Month"])
+    title, author = _q(SOURCE_COLS["Title"]), _q(SOURCE_COLS["Author"])
+    trans = _q(SOURCE_COLS["Type of Transaction"])
+    counts = _query(
+        f"SELECT {title} AS title, {author} AS author, {lib} AS lib, {month} AS month, "
+        f"count(*) AS n {_source()} AND {trans} = 'A' AND {title} IS NOT NULL "
+        f"AND {lib} IS NOT NULL GROUP BY ALL",
+        paths,
+    )
+    return build_search_index_from_counts(pd.DataFrame({
+        "Title": counts["title"],
+        "Author": counts["author"],
+        "Library": _translate(counts["lib"], "Library"),
+        "Month": counts["month"],
+        "Count": counts["n"],
+    }))
+
+
+def sample_preview(paths: list, year: int, libraries: list, n: int = 50) -> pd.DataFrame:
+    """n random borrowings with a title, cleaned and formatted like elements.make_preview."""
+    lib, title = _q(SOURCE_COLS["Library"]), _q(SOURCE_COLS["Title"])
+    trans = _q(SOURCE_COLS["Type of Transaction"])
+    columns = ", ".join(_q(col) for col in RENAME_COLS)
+    codes = [LIBRARY_CODES.get(name, name) for name in libraries]
+    # USING SAMPLE applies right after FROM, so filter in a subquery first
+    raw = _query(
+        f"SELECT * FROM (SELECT {columns} {_source()} AND {trans} = 'A' "
+        f"AND {title} IS NOT NULL AND list_contains($libraries, {lib})) "
+        f"USING SAMPLE reservoir({int(n)} ROWS)",
+        paths, libraries=codes,
+    )
+    sample = clean_data(raw, year)
+    return (
+        sample
+        .drop(columns=["Type of Transaction"], errors="ignore")
+        .assign(Month=month_labels(sample["Month"]), Year=sample["Year"].astype(str))
+        .reset_index(drop=True)
+    )
@@ -1,25 +1,26 @@
 # elements.py
 import pandas as pd
 import altair as alt
-from data_loader import load_and_clean_multiple, AGE_ORDER
+from data_loader import load_and_clean_multiple, AGE_ORDER, MONTH_ORDER, month_labels
+from aggregates import cube_libraries, cube_total, row_ranges, sample_rows, top_authors, top_titles
 
 ###sidebar options 
 
-def get_sidebar_options(cleaned_df: pd.DataFrame):
-    """Prepare sidebar options for years and libraries."""
-    years = sorted(cleaned_df["Year"].unique().tolist())
-    libraries = sorted(cleaned_df["Library"].dropna().unique().tolist())
+def get_sidebar_options(cube: dict):
+    """Prepare sidebar options for years and libraries from the count cube."""
+    years = cube["Year"]
+    libraries = cube_libraries(cube)
     return years, libraries
 
 
 
 ## Number of total Libraries, Borrowings and Renewals 
 
-def show_kpis(df_filtered):
-    """Return KPI values (libraries, borrowings, renewals)."""
-    total_borrowings = (df_filtered["Type of Transaction"] == "A").sum()
-    total_renewals   = (df_filtered["Type of Transaction"] == "T").sum()
-    num_libraries    = df_filtered["Library"].nunique()
+def show_kpis(cube, libraries_selected):
+    """Return KPI values (libraries, borrowings, renewals) read from the count cube."""
+    total_borrowings = cube_total(cube, libraries_selected, "A")
+    total_renewals   = cube_total(cube, libraries_selected, "T")
+    num_libraries    = len(set(cube_libraries(cube)) & set(libraries_selected))
     return num_libraries, total_borrowings, total_renewals
 
 
@@ -33,12 +34,28 @@ def show_dataframe(df_filtered):
         .reset_index(drop=True)
     )
 
+
+def make_preview(cleaned_df, row_index, libraries_selected, n=50):
+    """Random sample of n borrowings with a title, formatting only the sampled rows."""
+    ranges = row_ranges(row_index, libraries_selected, "A")
+    sample = sample_rows(cleaned_df, ranges, n=n, required=["Title"])
+    return (
+        sample
+        .drop(columns=["Type of Transaction"], errors="ignore")
+        .assign(Month=month_labels(sample["Month"]), Year=sample["Year"].astype(str))
+        .reset_index(drop=True)
+    )
+
     
 # --- Helper functions ---
 def format_year(year: int) -> str:
     return str(year)
 
 
+def format_years(years: list) -> str:
+    return " vs. ".join(format_year(year) for year in years)
+
+
 def format_libraries(libraries: list, max_display: int = 2) -> str:
     if not libraries:
         return "No libraries selected"
@@ -56,28 +73,22 @@ def normalize_author(name: str) -> str:
 
 
 # --- Top items by media ---
-def top_items_by_media(df, media_type, n=5):
-    filtered = df[df["Media Type"] == media_type]
-    counts = (
-        filtered.groupby(["Title", "Author"], observed=True)
-        .size()
-        .reset_index(name="Borrow Count")
-    )
-    return counts.sort_values("Borrow Count", ascending=False).head(n)
-
-def make_lists(borrowings_valid):
-    """Return top books, dvds, cds, authors as lists of strings."""
-    books = [row["Title"] for _, row in top_items_by_media(borrowings_valid, "Book").iterrows()]
-    dvds  = [row["Title"] for _, row in top_items_by_media(borrowings_valid, "DVD").iterrows()]
-    cds   = [row["Title"] for _, row in top_items_by_media(borrowings_valid, "CD").iterrows()]
-
-    author_counts = (
-        borrowings_valid.groupby("Author", observed=True)
-        .size()
-        .reset_index(name="Borrow Count")
-    )
-    top_authors = author_counts.sort_values("Borrow Count", ascending=False).head(5)
-    authors = [normalize_author(row["Author"]) for _, row in top_authors.iterrows()]
+def top_items_by_media(top_index, libraries, media_type, n=5):
+    counts = top_titles(top_index, libraries, media_type, n)
+    return counts.reset_index(name="Borrow Count")
+
+def make_list(top_index, kind, libraries_selected, n=5):
+    """Top n titles of one media type ("Book", "DVD", "CD") or authors ("Author")."""
+    if kind == "Author":
+        return [normalize_author(name) for name in top_authors(top_index, libraries_selected, n).index]
+    return top_items_by_media(top_index, libraries_selected, kind, n)["Title"].tolist()
+
+def make_lists(top_index, libraries_selected):
+    """Return top books, dvds, cds, authors as lists of strings from the top-N index."""
+    books   = make_list(top_index, "Book", libraries_selected)
+    dvds    = make_list(top_index, "DVD", libraries_selected)
+    cds     = make_list(top_index, "CD", libraries_selected)
+    authors = make_list(top_index, "Author", libraries_selected)
 
     return books, dvds, cds, authors
 
@@ -182,35 +193,108 @@ def make_line_chart(df, x_field="Month", y_field="Count", height=300, width=500)
 
 
 
+# --- Year comparison charts, fed by aggregates.year_over_year ---
+YEAR_COLORS = ["#B6B1E0", "#7A72B8", "#363062", "#1B1833"]
+
+def _comparison_tooltip(category_field):
+    return [
+        alt.Tooltip(category_field, title=category_field),
+        alt.Tooltip("Year", type="nominal"),
+        alt.Tooltip("Relative", type="quantitative", format=".1%", title="Relative (%)"),
+        alt.Tooltip("Count", type="quantitative", title="Absolute"),
+        alt.Tooltip("Change", type="quantitative", format="+,", title="Change vs. previous year"),
+        alt.Tooltip("Change %", type="quantitative", format="+.1%", title="Change (%)"),
+    ]
+
+def make_comparison_bar_chart(df, category_field, sort="-x", height=300, width=300, order=None):
+    """Horizontal bars per year (relative share), with year-over-year changes in the tooltip."""
+    years = sorted(df["Year"].unique())
+    height = max(height, df[category_field].nunique() * 12 * len(years))
+
+    return (
+        alt.Chart(df)
+        .mark_bar()
+        .encode(
+            y=alt.Y(category_field, type="nominal", sort=order or sort, title=None,
+                    axis=alt.Axis(labelColor="#363062", labelOverlap=False)),
+            yOffset=alt.YOffset("Year", type="nominal", sort=years),
+            x=alt.X("Relative", type="quantitative",
+                    axis=alt.Axis(format="%", title=None, labelColor="#363062")),
+            color=alt.Color("Year", type="nominal", sort=years,
+                            scale=alt.Scale(range=YEAR_COLORS[-len(years):]),
+                            legend=alt.Legend(orient="bottom", title=None)),
+            tooltip=_comparison_tooltip(category_field),
+        )
+        .properties(height=height, width=width)
+    )
+
+def make_comparison_line_chart(df, x_field="Month", height=300, width=500):
+    """One monthly line per year, with year-over-year changes in the tooltip."""
+    years = sorted(df["Year"].unique())
+
+    base = alt.Chart(df).encode(
+        x=alt.X(x_field, type="nominal", sort=MONTH_ORDER,
+                title=None, axis=alt.Axis(labelColor="#363062")),
+        y=alt.Y("Count", type="quantitative",
+                title=None, axis=alt.Axis(labelColor="#363062")),
+        color=alt.Color("Year", type="nominal", sort=years,
+                        scale=alt.Scale(range=YEAR_COLORS[-len(years):]),
+                        legend=alt.Legend(orient="bottom", title=None)),
+        tooltip=_comparison_tooltip(x_field),
+    )
+
+    line = base.mark_line()
+    points = base.mark_point(fill="#FFFFFF", size=60, strokeWidth=0.5)
+
+    return (line + points).properties(height=height, width=width)
+
+
+
+
+# --- Chart builders take ready [dimension, Count] frames (see aggregates.cube_counts) ---
+def make_media_chart(counts):
+    return make_horizontal_bar_chart(counts, "Media Type")
+
+def make_genre_chart(counts):
+    return make_horizontal_bar_chart(counts, "Genre")
+
+def make_target_chart(counts):
+    return make_horizontal_bar_chart(counts, "Target Group")
+
+def make_gender_chart(counts):
+    return make_horizontal_bar_chart(counts, "Gender")
 
-def make_media_chart(borrowings):
-    df = borrowings.groupby("Media Type", observed=True).size().reset_index(name="Count")
-    return make_horizontal_bar_chart(df, "Media Type")
+def make_age_chart(counts):
+    return make_bar_chart(counts, "Age Group", order=AGE_ORDER)
 
-def make_genre_chart(borrowings):
-    df = borrowings.groupby("Genre", observed=True).size().reset_index(name="Count")
-    return make_horizontal_bar_chart(df, "Genre")
+def make_user_chart(counts):
+    return make_horizontal_bar_chart(counts, "User Group")
 
-def make_target_chart(borrowings):
-    df = borrowings.groupby("Target Group", observed=True).size().reset_index(name="Count")
-    return make_horizontal_bar_chart(df, "Target Group")
+def make_library_chart(counts):
+    return make_horizontal_bar_chart(counts, "Library")
 
-def make_gender_chart(borrowings):
-    df = borrowings.groupby("Gender", observed=True).size().reset_index(name="Count")
-    return make_horizontal_bar_chart(df, "Gender")
+def make_month_chart(counts):
+    # the cube counts month numbers; names are applied here
+    return make_line_chart(counts.assign(Month=month_labels(counts["Month"])), "Month")
 
-def make_age_chart(borrowings):
-    df = borrowings.groupby("Age Group", observed=True).size().reset_index(name="Count")
-    return make_bar_chart(df, "Age Group", order=AGE_ORDER)
 
-def make_user_chart(borrowings):
-    df = borrowings.groupby("User Group", observed=True).size().reset_index(name="Count")
-    return make_horizontal_bar_chart(df, "User Group")
+# --- One entry point per dimension, used for the cached chart specs ---
+CHART_BUILDERS = {
+    "Media Type": make_media_chart,
+    "Genre": make_genre_chart,
+    "Target Group": make_target_chart,
+    "Gender": make_gender_chart,
+    "Age Group": make_age_chart,
+    "User Group": make_user_chart,
+    "Library": make_library_chart,
+    "Month": make_month_chart,
+}
 
-def make_library_chart(borrowings):
-    df = borrowings.groupby("Library", observed=True).size().reset_index(name="Count")
-    return make_horizontal_bar_chart(df, "Library")
+def make_chart(dimension, counts):
+    return CHART_BUILDERS[dimension](counts)
 
-def make_month_chart(borrowings):
-    df = borrowings.groupby("Month", observed=True).size().reset_index(name="Count")
-    return make_line_chart(df, "Month")
+def make_comparison_chart(dimension, df):
+    """Year comparison chart of one dimension from an aggregates.year_over_year frame."""
+    if dimension == "Month":
+        return make_comparison_line_chart(df.assign(Month=month_labels(df["Month"])))
+    return make_comparison_bar_chart(df, dimension, order=AGE_ORDER if dimension == "Age Group" else None)
@@ -1,3 +1,8 @@
+import argparse
+from collections import ChainMap, deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
 import pandas as pd
 from ftfy import fix_text
 import os
@@ -6,31 +11,152 @@ import re
 INPUT = "data/Pankow_2024.csv"
 OUTPUT = "data/Pankow_2024_utf8.csv"
 
-def repair_csv(path: str, out_path: str):
-    print(f"👉 Repairing {path} → {out_path}")
-    df = pd.read_csv(path, encoding="utf-8", on_bad_lines="skip")
+# --- Streaming mode defaults ---
+CHUNKSIZE = 200_000
+WORKERS = os.cpu_count() or 1
 
-    # Step 1: fix mojibake with ftfy
-    for i, col in enumerate(df.select_dtypes(include=["object"]).columns, start=1):
-        print(f"   [{i}] Fixing column: {col}")
-        df[col] = df[col].map(lambda x: fix_text(x) if isinstance(x, str) else x)
+# Printable ASCII without "&" cannot contain mojibake or HTML entities,
+# so fix_text would return it unchanged
+SAFE_ASCII = r"[\x20-\x25\x27-\x7e]*"
+
+def load_lookup(path: str) -> dict:
+    """Load a persistent {raw value: repaired value} table, empty if missing."""
+    if not path or not os.path.exists(path):
+        return {}
+    table = pd.read_parquet(path)
+    return dict(zip(table["raw"], table["repaired"]))
+
+def save_lookup(lookup: dict, path: str):
+    """Persist the repair lookup table as Parquet."""
+    pd.DataFrame(
+        {"raw": list(lookup.keys()), "repaired": list(lookup.values())}
+    ).to_parquet(path, index=False)
+
+def repair_uniques(uniques, lookup) -> np.ndarray:
+    """Repair distinct values, reusing and extending the lookup table.
 
-    # Step 2: remove stray "¬" and normalize spacing
-    for col in df.select_dtypes(include=["object"]).columns:
-        df[col] = (
-            df[col]
+    Step 1 fixes mojibake with ftfy (skipped for safe ASCII), step 2 removes
+    stray "¬" and normalizes spacing. Non-string values become NaN, as the
+    .str accessor did on whole columns.
+    """
+    values = pd.Series(np.asarray(uniques, dtype=object), dtype=object)
+    repaired = pd.Series(np.nan, index=values.index, dtype=object)
+
+    is_str = np.array([isinstance(x, str) for x in values], dtype=bool)
+    known = pd.Series([lookup.get(x) if s else None for x, s in zip(values, is_str)],
+                      index=values.index, dtype=object)
+    repaired[known.notna()] = known[known.notna()]
+
+    todo = values[is_str & known.isna().to_numpy()]
+    if len(todo):
+        safe = todo.str.fullmatch(SAFE_ASCII).to_numpy(dtype=bool)
+        fixed = todo.copy()
+        fixed[~safe] = todo[~safe].map(fix_text)
+        fixed = (
+            fixed
             .str.replace("¬", "", regex=False)      # remove the character
             .str.replace(r"\s+", " ", regex=True)   # collapse multiple spaces
             .str.strip()                            # trim start/end spaces
         )
+        repaired[todo.index] = fixed
+        lookup.update(zip(todo, fixed))
+    return repaired.to_numpy(dtype=object)
+
+def repair_column(col: pd.Series, lookup) -> pd.Series:
+    """Repair one text column through its distinct values only."""
+    codes, uniques = pd.factorize(col)
+    repaired = np.append(repair_uniques(uniques, lookup), np.nan)  # code -1 → NaN
+    return pd.Series(repaired[codes], index=col.index, name=col.name, dtype=object)
+
+def repair_frame(df: pd.DataFrame, lookup=None, verbose: bool = False) -> pd.DataFrame:
+    """Fix mojibake and normalize spacing in every text column of a frame."""
+    lookup = {} if lookup is None else lookup
+    for i, col in enumerate(df.select_dtypes(include=["object"]).columns, start=1):
+        if verbose:
+            print(f"   [{i}] Fixing column: {col}")
+        df[col] = repair_column(df[col], lookup)
+    return df
+
+def repair_csv(path: str, out_path: str, lookup_path: str = None):
+    print(f"👉 Repairing {path} → {out_path}")
+    df = pd.read_csv(path, encoding="utf-8", on_bad_lines="skip")
+
+    lookup = load_lookup(lookup_path)
+    df = repair_frame(df, lookup, verbose=True)
+    if lookup_path:
+        save_lookup(lookup, lookup_path)
 
     # Save clean UTF-8
     df.to_csv(out_path, encoding="utf-8", index=False)
     print(f"✅ Saved repaired file: {out_path}\n")
 
+# --- Streaming workers: lookup loaded once per process, new fixes sent back ---
+_worker_lookup = {}
+
+def _init_worker(lookup: dict):
+    global _worker_lookup
+    _worker_lookup = lookup
+
+def _repair_chunk(chunk: pd.DataFrame):
+    new = {}
+    repaired = repair_frame(chunk, ChainMap(new, _worker_lookup))
+    _worker_lookup.update(new)
+    return repaired, new
+
+def repair_csv_streaming(path: str, out_path: str, chunksize: int = CHUNKSIZE,
+                         workers: int = WORKERS, lookup_path: str = None):
+    """Repair a CSV chunk by chunk on a process pool, writing results in order.
+
+    At most two chunks per worker are in flight, so peak memory is bounded by
+    the chunk size, not the file size.
+    """
+    print(f"👉 Repairing {path} → {out_path} (chunks of {chunksize:,} rows, {workers} workers)")
+    chunks = pd.read_csv(path, encoding="utf-8", on_bad_lines="skip", chunksize=chunksize)
+    lookup = load_lookup(lookup_path)
+
+    rows_done = 0
+    header = True
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(lookup,)) as pool, \
+            open(out_path, "w", encoding="utf-8", newline="") as out:
+
+        def write_next():
+            nonlocal rows_done, header
+            repaired, new = pending.popleft().result()
+            lookup.update(new)
+            repaired.to_csv(out, index=False, header=header)
+            header = False
+            rows_done += len(repaired)
+            print(f"   {rows_done:,} rows repaired")
+
+        for chunk in chunks:
+            pending.append(pool.submit(_repair_chunk, chunk))
+            if len(pending) >= 2 * workers:
+                write_next()
+        while pending:
+            write_next()
+
+    if lookup_path:
+        save_lookup(lookup, lookup_path)
+    print(f"✅ Saved repaired file: {out_path}\n")
+
 if __name__ == "__main__":
-    if not os.path.exists(INPUT):
-        print(f"❌ File not found: {INPUT}")
+    parser = argparse.ArgumentParser(description="Repair mojibake in a Pankow CSV export.")
+    parser.add_argument("input", nargs="?", default=INPUT)
+    parser.add_argument("output", nargs="?", default=OUTPUT)
+    parser.add_argument("--stream", action="store_true", help="repair in chunks on a process pool")
+    parser.add_argument("--chunksize", type=int, default=CHUNKSIZE)
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--lookup", default=None,
+                        help="Parquet table of known fixes, reused and extended across files")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.input):
+        print(f"❌ File not found: {args.input}")
+    elif args.stream:
+        repair_csv_streaming(args.input, args.output, args.chunksize, args.workers, args.lookup)
+        print("🎉 Done!")
     else:
-        repair_csv(INPUT, OUTPUT)
-        print("🎉 Done!")
\ No newline at end of file
+        repair_csv(args.input, args.output, args.lookup)
+        print("🎉 Done!")
@@ -0,0 +1,94 @@
+# ingest.py
+import argparse
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+from data_loader import RENAME_COLS, SORT_KEYS, clean_data, concat_cleaned
+from encoding import load_lookup, repair_frame, save_lookup
+
+DATASET_DIR = "dataset"
+PARTITION_COLS = ["Year", "Library"]
+
+# --- Parquet layout ---
+CHUNKSIZE = 500_000
+ROW_GROUP_SIZE = 250_000
+
+
+def ingest_csv(path: str, year: int, dataset_dir: str = DATASET_DIR,
+               lookup_path: str = None, chunksize: int = CHUNKSIZE,
+               row_group_size: int = ROW_GROUP_SIZE):
+    """Repair, clean and write one yearly CSV export as a partitioned dataset.
+
+    The CSV is read in chunks; each chunk is repaired with encoding.repair_frame
+    and cleaned with data_loader.clean_data, so only the compact cleaned year is
+    held in memory. Partitions of the same year are replaced.
+    """
+    print(f"👉 Ingesting {path} ({year}) → {dataset_dir}")
+    lookup = load_lookup(lookup_path)
+    chunks = pd.read_csv(
+        path, encoding="utf-8", on_bad_lines="skip",
+        usecols=list(RENAME_COLS), chunksize=chunksize,
+    )
+
+    cleaned_parts = []
+    rows = 0
+    for chunk in chunks:
+        cleaned_parts.append(clean_data(repair_frame(chunk, lookup), year))
+        rows += len(chunk)
+        print(f"   {rows:,} rows repaired and cleaned")
+    if lookup_path:
+        save_lookup(lookup, lookup_path)
+
+    cleaned = concat_cleaned(cleaned_parts)
+    cleaned = cleaned.sort_values(SORT_KEYS, kind="stable", ignore_index=True)
+    write_partitioned(cleaned, dataset_dir, row_group_size)
+    print(f"✅ Wrote {len(cleaned):,} rows for {year}\n")
+
+
+def write_partitioned(cleaned, dataset_dir: str = DATASET_DIR,
+                      row_group_size: int = ROW_GROUP_SIZE):
+    """Write cleaned rows as Year=/Library= Parquet partitions.
+
+    Row groups are capped at row_group_size; columns are dictionary encoded and
+    carry statistics, so readers can skip partitions and row groups.
+    """
+    table = pa.Table.from_pandas(cleaned, preserve_index=False)
+    file_format = ds.ParquetFileFormat()
+    ds.write_dataset(
+        table,
+        dataset_dir,
+        format=file_format,
+        file_options=file_format.make_write_options(
+            compression="zstd", use_dictionary=True, write_statistics=True,
+        ),
+        partitioning=PARTITION_COLS,
+        partitioning_flavor="hive",
+        basename_template="part-{i}.parquet",
+        max_rows_per_group=row_group_size,
+        min_rows_per_group=min(row_group_size, 64_000),
+        existing_data_behavior="delete_matching",
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Turn a raw Pankow CSV export into the partitioned dataset the app reads."
+    )
+    parser.add_argument("input", help="raw CSV export from the Berlin Open Data Portal")
+    parser.add_argument("--year", type=int, required=True)
+    parser.add_argument("--out", default=DATASET_DIR)
+    parser.add_argument("--lookup", default=None,
+                        help="Parquet table of known encoding fixes, reused and extended")
+    parser.add_argument("--chunksize", type=int, default=CHUNKSIZE)
+    parser.add_argument("--row-group-size", type=int, default=ROW_GROUP_SIZE)
+    args = parser.parse_args()
+
+    if not os.path.exists(args.input):
+        print(f"❌ File not found: {args.input}")
+    else:
+        ingest_csv(args.input, args.year, args.out, args.lookup,
+                   args.chunksize, args.row_group_size)
+        print("🎉 Done!")
@@ -1,8 +1,20 @@
+import glob
+import os
 import streamlit as st
 import pandas as pd
-import altair as alt
-from data_loader import load_and_clean_multiple, AGE_ORDER
+from aggregates import (
+    build_count_cube, build_top_index, cube_counts,
+    merge_cubes, merge_top_indexes, year_over_year, year_over_year_totals,
+)
+from store import (
+    append_dataset, cache_stats, dataset_memory_usage, get_rows, load_dataset, reload_dataset,
+)
+from profiling import RerunProfile
+from data_loader import memory_report
+from search import NGRAM, build_search_index, search, search_months
 import elements as el
+import snapshot
+import warmup
 
 
 # --- File paths ---
@@ -11,6 +23,47 @@ files = {
     2024: ["Pankow_2024_part1.parquet", "Pankow_2024_part2.parquet"],
 }
 
+# --- Partitioned dataset written by ingest.py, preferred when a year is there ---
+DATASET_DIR = "dataset"
+
+def year_sources(year: int) -> list:
+    if os.path.isdir(os.path.join(DATASET_DIR, f"Year={year}")):
+        return [DATASET_DIR]
+    return files[year]
+
+# --- Monthly deltas: raw Parquet parts dropped into <MONTHLY_DIR>/<year>/ are
+# appended to that year by the warm-up thread, without rebuilding it ---
+MONTHLY_DIR = os.environ.get("DASHBOARD_MONTHLY_DIR", "monthly")
+
+def month_files(year: int) -> list:
+    return sorted(glob.glob(os.path.join(MONTHLY_DIR, str(year), "*.parquet")))
+
+# --- Aggregation engine: "pandas" (in-memory, default) or "duckdb" (SQL over
+# the raw Parquet parts, only aggregates held in memory) ---
+ENGINE = os.environ.get("DASHBOARD_ENGINE", "pandas")
+if ENGINE == "duckdb":
+    import duckdb_backend
+
+def engine_paths(year: int) -> list:
+    """Sources for a year: the DuckDB engine always reads the raw Parquet parts."""
+    return files[year] if ENGINE == "duckdb" else year_sources(year)
+
+# --- Read-only mode: DASHBOARD_SNAPSHOT=<path> serves a snapshot.py export,
+# no rows are loaded (no preview sample, no search) ---
+SNAPSHOT_PATH = os.environ.get("DASHBOARD_SNAPSHOT")
+SNAPSHOT = snapshot.load(SNAPSHOT_PATH) if SNAPSHOT_PATH else None
+if SNAPSHOT:
+    files = {year: [] for year in SNAPSHOT["years"]}
+
+def snapshot_view(year: int, libraries: list):
+    """Exported view of a selection; None outside read-only mode or if not exported."""
+    return snapshot.view(SNAPSHOT, year, libraries) if SNAPSHOT else None
+
+# --- Opt-in stage profiling: ?debug=1 in the URL or DASHBOARD_DEBUG=1 shows
+# the debug panel; DASHBOARD_PROFILE_LOG=<path> appends every rerun as JSON
+# lines without showing it ---
+PROFILE_LOG = os.environ.get("DASHBOARD_PROFILE_LOG")
+
 # --- Page config ---
 st.set_page_config(
     page_title="Pankow Libraries: Data Explorer",
@@ -32,7 +85,7 @@ st.markdown(
     """
     <p style='color:#6E6E6E; font-size:13px; margin-bottom:0px;'>
     Use the filters on the left to select or deselect libraries.  
-    Choose one year to explore — data and charts update dynamically upon your selection!
+    Choose one year to explore, or add more years to compare them — data and charts update dynamically upon your selection!
     </p>
     """,
     unsafe_allow_html=True
@@ -51,6 +104,7 @@ with st.sidebar:
     
     st.header("Year")
     year_placeholder = st.empty()
+    compare_placeholder = st.empty()
 
     st.header("Library")
     library_placeholder = st.empty()
@@ -63,44 +117,123 @@ with st.sidebar:
 # -------------------
 year_selected = year_placeholder.radio(
     "Select year to explore:",
-    options=[2022, 2024],
-    index=1,   # default = 2024
+    options=list(files),
+    index=len(files) - 1,   # default = latest year
 )
 
 # -------------------
-# Clear cache if user switches year
+# Optional comparison years (only their count cubes are loaded)
 # -------------------
-if "last_year" not in st.session_state:
-    st.session_state["last_year"] = year_selected
-elif st.session_state["last_year"] != year_selected:
-    st.cache_data.clear()  # drop cached data from previous year
-    st.session_state["last_year"] = year_selected
+compare_years = compare_placeholder.multiselect(
+    "Compare with:",
+    options=[year for year in files if year != year_selected],
+)
+years_compared = sorted([year_selected] + compare_years)
+
+debug = st.query_params.get("debug") == "1" or os.environ.get("DASHBOARD_DEBUG") == "1"
+profile = RerunProfile(enabled=debug or bool(PROFILE_LOG), context={"year": year_selected})
 
 # -------------------
-# Caching for the current year only
+# Cleaned rows live in the shared store (one read-only copy per year with its
+# row index, LRU within a memory budget). The warm-up thread builds count
+# cube, top-N and search index of every year at start and leaves the rows of
+# the default year, and of other years while they fit the budget, in the
+# store, so no request pays the first load. Rows of comparison-only years that
+# do not fit are dropped, those years cost only their aggregates. Aggregates
+# are rebuilt in the background when the sources change and extended in place
+# when a new monthly delta file arrives
 # -------------------
-@st.cache_data(ttl=3600, show_spinner=False)
-def cached_load_and_clean(year: int, paths: list) -> pd.DataFrame:
-    return load_and_clean_multiple({year: paths})
+def frame_state(df: pd.DataFrame) -> dict:
+    return {
+        "cube": build_count_cube(df),
+        "top_index": build_top_index(df),
+        "search": [build_search_index(df)],
+    }
+
+def build_year_state(year: int, paths: list, reload: bool = False) -> dict:
+    if ENGINE == "duckdb":
+        return {
+            "cube": duckdb_backend.build_count_cube(paths, year),
+            "top_index": duckdb_backend.build_top_index(paths, year),
+            "search": [duckdb_backend.build_search_index(paths, year)],
+        }
+    # the default (latest) year stays in the store, others while they fit
+    keep = True if year == list(files)[-1] else None
+    load = reload_dataset if reload else load_dataset
+    return frame_state(load(year, paths, keep=keep))
+
+def append_year_state(state: dict, year: int, paths: list, new_files: list) -> dict:
+    """State with new monthly files added; only their rows are cleaned and counted."""
+    if ENGINE == "duckdb":
+        delta = build_year_state(year, new_files)
+    else:
+        delta = frame_state(append_dataset(year, paths, new_files))
+    return {
+        "cube": merge_cubes(state["cube"], delta["cube"]),
+        "top_index": merge_top_indexes(state["top_index"], delta["top_index"]),
+        "search": state["search"] + delta["search"],
+    }
+
+if not SNAPSHOT:
+    warmup.start(
+        {year: engine_paths(year) for year in files}, build_year_state,
+        deltas=month_files, append=append_year_state,
+    )
+
+def cached_count_cube(year: int, paths: list) -> dict:
+    if SNAPSHOT:
+        return SNAPSHOT["years"][int(year)]["cube"]
+    return warmup.get_state(year, paths, build_year_state)["cube"]
+
+def cached_top_index(year: int, paths: list) -> dict:
+    return warmup.get_state(year, paths, build_year_state)["top_index"]
+
+def cached_search_index(year: int, paths: list) -> list:
+    return warmup.get_state(year, paths, build_year_state)["search"]
 
 # -------------------
 # Load dataset for selected year
 # -------------------
 with st.spinner(f"Loading exciting library data from {year_selected}..."):
-    cleaned_df = cached_load_and_clean(year_selected, files[year_selected])
+    if SNAPSHOT:
+        # only the exported cubes, lists and specs, no rows
+        paths = engine_paths(year_selected)
+        cleaned_df, row_index = None, None
+    elif ENGINE == "duckdb":
+        # rows stay on disk, only the aggregates below are loaded
+        paths = engine_paths(year_selected)
+        cleaned_df, row_index = None, None
+    else:
+        paths = engine_paths(year_selected)
+        with profile.stage("load_dataset") as stage:
+            cleaned_df, row_index = get_rows(year_selected, paths)
+            stage.rows = len(cleaned_df)
+    with profile.stage("count_cube"):
+        cube = cached_count_cube(year_selected, paths)
+    if not SNAPSHOT:
+        with profile.stage("top_index"):
+            top_index = cached_top_index(year_selected, paths)
+
+if compare_years:
+    with st.spinner(f"Loading {', '.join(map(str, compare_years))} for comparison..."):
+        with profile.stage("compare_cubes"):
+            cubes = {
+                year: cube if year == year_selected else cached_count_cube(year, engine_paths(year))
+                for year in years_compared
+            }
 
 # -------------------
-# Library filter (now based on cleaned_df)
+# Library filter (now based on the count cube)
 # -------------------
-years, libraries = el.get_sidebar_options(cleaned_df)
-
-options = ["All Libraries"] + libraries
-choice = library_placeholder.selectbox("Choose Library:", options)
+years, libraries = el.get_sidebar_options(cube)
 
-if choice == "All Libraries":
-    libraries_selected = libraries
-else:
-    libraries_selected = [choice]
+# any subset of libraries: counts are sums of per-library cube rows and
+# top lists are merged per-library lists, so no rows are re-filtered
+libraries_selected = library_placeholder.multiselect(
+    "Choose Libraries:", libraries, default=libraries
+)
+all_libraries = len(libraries_selected) == len(libraries)
+profile.context["libraries"] = len(libraries_selected)
 
 # -------------------
 # Info link at bottom
@@ -111,50 +244,182 @@ info_placeholder.markdown(
     "to get more information about the datasets and download the raw files."
 )
 
+# Readiness of the background warm-up (other years load without blocking)
+if not SNAPSHOT:
+    warmup_status = warmup.status()
+    pending = [str(s["year"]) for s in warmup_status if s["state"] in ("pending", "building")]
+    with st.sidebar:
+        if pending:
+            st.caption(f"⏳ Preparing {', '.join(pending)} in the background…")
+        for s in warmup_status:
+            if s["state"] == "error":
+                st.caption(f"⚠️ {s['year']} could not be loaded: {s['error']}")
+
+if not libraries_selected:
+    st.info("Select at least one library on the left to explore the data.")
+    st.stop()
+
 # -------------------
-# Apply filters (now only one year, no isin!)
+# Sections below are st.fragment functions with their inputs passed in
+# explicitly: a widget inside one section (new preview sample, list length)
+# reruns only that section. Sidebar changes still rerun the whole page.
+# Profiled stages and the debug panel cover full reruns.
 # -------------------
-df_filtered = cleaned_df[
-    (cleaned_df["Year"] == year_selected) &
-    (cleaned_df["Library"].isin(libraries_selected))
-]
+@st.cache_data(ttl=3600, show_spinner=False, max_entries=1024)
+def cached_chart_spec(years: tuple, dimension: str, libraries: tuple, versions: tuple) -> dict:
+    """Vega-Lite spec of one chart; reruns with unchanged inputs reuse it.
+
+    `versions` (warm-up build counters of the years) makes rebuilt years miss.
+    """
+    if len(years) > 1:
+        cubes = {year: cached_count_cube(year, engine_paths(year)) for year in years}
+        return el.make_comparison_chart(
+            dimension, year_over_year(cubes, dimension, list(libraries))
+        ).to_dict()
+    cube = cached_count_cube(years[0], engine_paths(years[0]))
+    return el.make_chart(dimension, cube_counts(cube, dimension, list(libraries))).to_dict()
+
+
+def section_header(title: str, libraries: list):
+    st.markdown(f"<div style='color:#363062; font-size:16px; font-weight:bold;'>{title}</div>", unsafe_allow_html=True)
+    st.markdown(f"<div style='color:#6E6E6E; font-size:12px; margin-bottom:12px;'>{el.format_libraries(libraries)}</div>", unsafe_allow_html=True)
+
+
+@st.fragment
+def preview_section(year: int, paths: list, libraries: list):
+    """Random sample of up to 50 borrowings, only the sampled rows are built."""
+    if SNAPSHOT:
+        st.caption("🔒 Read-only snapshot: no sample of individual borrowings.")
+        return
+    with profile.stage("preview_sample") as stage:
+        if ENGINE == "duckdb":
+            df_display = duckdb_backend.sample_preview(
+                paths + warmup.applied(year, paths), year, libraries, n=50
+            )
+        else:
+            # frame and row index from one store entry, so offsets always match
+            df_display = el.make_preview(*get_rows(year, paths), libraries, n=50)
+        stage.rows = len(df_display)
+
+    # Hide the index by dropping it
+    st.dataframe(df_display.style.hide(axis="index"))
+    st.button("🔀 New sample", key="resample")
+
+
+TOP_LISTS = {"Author": "Authors", "Book": "Books", "CD": "CDs", "DVD": "DVDs"}
+
+@st.fragment
+def dashboard_row(kind: str, dimensions: list, year: int, paths: list, years: list, libraries: list):
+    """One row: a top list of `kind` next to the charts of `dimensions`."""
+    col_list, space, col_a, space, col_b = st.columns([1, 0.1, 1.5, 0.1, 1.5])
+
+    with col_list:
+        n = st.radio(
+            "List length", [5, 10, 20], horizontal=True,
+            key=f"top_{kind}", label_visibility="collapsed",
+        )
+        section_header(f"Top {n} {TOP_LISTS[kind]} ({el.format_year(year)})", libraries)
+        view = snapshot_view(year, libraries)
+        with profile.stage(f"list_{kind}"):
+            if view:
+                items = view["lists"][kind][:n]
+            elif SNAPSHOT:
+                items = []
+                st.caption("Top lists are exported for all libraries and for single libraries.")
+            else:
+                items = el.make_list(cached_top_index(year, paths), kind, libraries, n)
+        for item in items:
+            st.markdown(f"<p style='color:#363062; font-size:14px;'>{item}</p>", unsafe_allow_html=True)
+
+    # counts sliced from the cube(s), spec cached per (years, dimension, libraries)
+    for col, dimension in zip([col_a, col_b], dimensions):
+        if dimension is None:
+            continue
+        with col:
+            section_header(f"Borrowings by {dimension} ({el.format_years(years)})", libraries)
+            with profile.stage(f"chart_{dimension}"):
+                if view and len(years) == 1:
+                    spec = view["charts"][dimension]
+                else:
+                    versions = tuple(warmup.version(year, engine_paths(year)) for year in years)
+                    spec = cached_chart_spec(tuple(years), dimension, tuple(libraries), versions)
+            st.vega_lite_chart(spec, use_container_width=True)
+
+    st.markdown("---")
+
+
+@st.fragment
+def search_section(year: int, paths: list, libraries: list):
+    """Title/author search over the year's n-gram index, with monthly borrowings."""
+    section_header(f"Search Titles and Authors ({el.format_year(year)})", libraries)
+    if SNAPSHOT:
+        st.caption("🔒 Read-only snapshot: search needs the full data.")
+        return
+    query = st.text_input(
+        "Search titles and authors", key="search",
+        placeholder="Title or author, e.g. Funke", label_visibility="collapsed",
+    ).strip()
+    if not query:
+        return
+    if len(query) < NGRAM:
+        st.caption(f"Type at least {NGRAM} characters.")
+        return
+
+    with profile.stage("search") as stage:
+        segments = cached_search_index(year, paths)
+        results, n_matches, matches = search(segments, query, libraries)
+        stage.rows = n_matches
+    if results.empty:
+        st.caption("No borrowings found.")
+        return
+
+    col_table, space, col_chart = st.columns([2.6, 0.1, 1.5])
+    with col_table:
+        st.caption(f"{n_matches:,} matching titles, most borrowed first (top {len(results)} shown)")
+        st.dataframe(results, hide_index=True)
+    with col_chart:
+        st.altair_chart(
+            el.make_month_chart(search_months(segments, matches, libraries)), use_container_width=True
+        )
+
 
 # --- KPI Layout, KPI and Dataframe imported from charts_lists_frames.py  ---
 spacing, col_left, col_right = st.columns([0.1, 2, 5])
 
 with col_left:
-    num_libraries, total_borrowings, total_renewals = el.show_kpis(df_filtered)
+    with profile.stage("kpis"):
+        view = snapshot_view(year_selected, libraries_selected)
+        if view:
+            num_libraries, total_borrowings, total_renewals = view["kpis"]
+        else:
+            num_libraries, total_borrowings, total_renewals = el.show_kpis(cube, libraries_selected)
     st.metric(" ", " ")
     
-    if choice == "All":
-        lib_label = "8 Pankow District Libraries"
+    if all_libraries:
+        lib_label = f"{len(libraries)} Pankow District Libraries"
     elif len(libraries_selected) == 1:
         lib_label = libraries_selected[0]
     else:
         lib_label = f"{len(libraries_selected)} Libraries"
     
     st.metric("Library/ Libraries", lib_label)
-    st.metric("Borrowings", f"{total_borrowings:,}".replace(",", "."))
-    st.metric("Renewals", f"{total_renewals:,}".replace(",", "."))
-
-with col_right:
-    # Subset borrowings
-    df_display = (
-        df_filtered[df_filtered["Type of Transaction"] == "A"]
-        .dropna(subset=["Title"])
-        .drop(columns=["Type of Transaction"], errors="ignore")
-        .assign(Year=df_filtered["Year"].astype(str))
-        .reset_index(drop=True)   # reset index
-    )
-
-    # Take a random sample of up to 100 rows
-    if len(df_display) > 50:
-        df_display = df_display.sample(n=50, random_state=None).reset_index(drop=True)
+    if compare_years:
+        # one metric per year, delta against the previous compared year
+        totals = year_over_year_totals(cubes, libraries_selected)
+        for kpi in ["Borrowings", "Renewals"]:
+            for year in totals.index:
+                change = totals.loc[year, f"{kpi} Change %"]
+                st.metric(
+                    f"{kpi} ({year})",
+                    f"{totals.loc[year, kpi]:,}".replace(",", "."),
+                    delta=None if pd.isna(change) else f"{change:+.1%}",
+                )
     else:
-        df_display = df_display.sample(frac=1, random_state=None).reset_index(drop=True)
+        st.metric("Borrowings", f"{total_borrowings:,}".replace(",", "."))
+        st.metric("Renewals", f"{total_renewals:,}".replace(",", "."))
 
-    # Hide the index by dropping it
-    st.dataframe(df_display.style.hide(axis="index"))
+with col_right:
+    preview_section(year_selected, paths, libraries_selected)
 
     st.markdown(
         """
@@ -169,147 +434,47 @@ with col_right:
 # --- Seperation line --- 
 st.markdown("---")
 
-# -------------------
-# Input for Lists and Charts 
-# -------------------
-
-# --- Filtered subset for Borrowings only  ---
-borrowings = df_filtered[df_filtered["Type of Transaction"] == "A"]
-
-# --- Lists ---
-books_list, dvds_list, cds_list, authors_list = el.make_lists(borrowings)
-
-# --- Charts ---
-media_chart   = el.make_media_chart(borrowings)
-genre_chart   = el.make_genre_chart(borrowings)
-target_chart  = el.make_target_chart(borrowings)
-age_chart     = el.make_age_chart(borrowings)
-user_chart    = el.make_user_chart(borrowings)
-library_chart = el.make_library_chart(borrowings)
-month_chart   = el.make_month_chart(borrowings)
-gender_chart = el.make_gender_chart(borrowings)
-
-
-
 # -------------------
 # Row 1 → Demographics (who borrows?)
-# -------------------
-col4, space, col5, space, col6 = st.columns([1, 0.1, 1.5, 0.1, 1.5])
-
-with col4:
-    st.markdown(f"<div style='color:#363062; font-size:16px; font-weight:bold;'>Top 5 Authors ({el.format_year(year_selected)})</div>", unsafe_allow_html=True)
-    st.markdown(f"<div style='color:#6E6E6E; font-size:12px; margin-bottom:12px;'>{el.format_libraries(libraries_selected)}</div>", unsafe_allow_html=True)
-    for author in authors_list:
-        st.markdown(f"<p style='color:#363062; font-size:14px;'>{author}</p>", unsafe_allow_html=True)
-
-with col5:
-    st.markdown(f"<div style='color:#363062; font-size:16px; font-weight:bold;'>Borrowings by Target Group ({el.format_year(year_selected)})</div>", unsafe_allow_html=True)
-    st.markdown(f"<div style='color:#6E6E6E; font-size:12px; margin-bottom:12px;'>{el.format_libraries(libraries_selected)}</div>", unsafe_allow_html=True)
-    st.altair_chart(target_chart, use_container_width=True)
-
-with col6:
-    st.markdown(f"<div style='color:#363062; font-size:16px; font-weight:bold;'>Borrowings by Gender ({el.format_year(year_selected)})</div>", unsafe_allow_html=True)
-    st.markdown(f"<div style='color:#6E6E6E; font-size:12px; margin-bottom:12px;'>{el.format_libraries(libraries_selected)}</div>", unsafe_allow_html=True)
-    st.altair_chart(gender_chart, use_container_width=True)
-
-st.markdown("---")
-
-
-
-
-# -------------------
 # Row 2 → Collection / Materials
-# -------------------
-col1, space,  col3, space, col2,= st.columns([1, 0.1, 1.5, 0.1, 1.5])
-
-with col1:
-    st.markdown(f"<div style='color:#363062; font-size:16px; font-weight:bold;'>Top 5 Books ({el.format_year(year_selected)})</div>", unsafe_allow_html=True)
-    st.markdown(f"<div style='color:#6E6E6E; font-size:12px; margin-bottom:12px;'>{el.format_libraries(libraries_selected)}</div>", unsafe_allow_html=True)
-    for book in books_list:
-        st.markdown(f"<p style='color:#363062; font-size:14px;'>{book}</p>", unsafe_allow_html=True)
-
-
-with col3:
-    st.markdown(f"<div style='color:#363062; font-size:16px; font-weight:bold;'>Borrowings by Genre ({el.format_year(year_selected)})</div>", unsafe_allow_html=True)
-    st.markdown(f"<div style='color:#6E6E6E; font-size:12px; margin-bottom:12px;'>{el.format_libraries(libraries_selected)}</div>", unsafe_allow_html=True)
-    st.altair_chart(genre_chart, use_container_width=True)
-
-with col2:
-    st.markdown(f"<div style='color:#363062; font-size:16px; font-weight:bold;'>Borrowings by Media Type ({el.format_year(year_selected)})</div>", unsafe_allow_html=True)
-    st.markdown(f"<div style='color:#6E6E6E; font-size:12px; margin-bottom:12px;'>{el.format_libraries(libraries_selected)}</div>", unsafe_allow_html=True)
-    st.altair_chart(media_chart, use_container_width=True)
-
-    
-st.markdown("---")
-
-
-
-
-# -------------------
 # Row 3 → Access / Formats
+# Row 4 → Place + Time (library chart only if more than one library is selected)
 # -------------------
-col7, space, col8, space, col9 = st.columns([1, 0.1, 1.5, 0.1, 1.5])
-
-with col7:
-    st.markdown(f"<div style='color:#363062; font-size:16px; font-weight:bold;'>Top 5 CDs ({el.format_year(year_selected)})</div>", unsafe_allow_html=True)
-    st.markdown(f"<div style='color:#6E6E6E; font-size:12px; margin-bottom:12px;'>{el.format_libraries(libraries_selected)}</div>", unsafe_allow_html=True)
-    for cd in cds_list:
-        st.markdown(f"<p style='color:#363062; font-size:14px;'>{cd}</p>", unsafe_allow_html=True)
-
-with col8:
-    st.markdown(f"<div style='color:#363062; font-size:16px; font-weight:bold;'>Borrowings by Age Group ({el.format_year(year_selected)})</div>", unsafe_allow_html=True)
-    st.markdown(f"<div style='color:#6E6E6E; font-size:12px; margin-bottom:12px;'>{el.format_libraries(libraries_selected)}</div>", unsafe_allow_html=True)
-    st.altair_chart(age_chart, use_container_width=True)
-
-with col9:
-    st.markdown(f"<div style='color:#363062; font-size:16px; font-weight:bold;'>Borrowings by User Group ({el.format_year(year_selected)})</div>", unsafe_allow_html=True)
-    st.markdown(f"<div style='color:#6E6E6E; font-size:12px; margin-bottom:12px;'>{el.format_libraries(libraries_selected)}</div>", unsafe_allow_html=True)
-    st.altair_chart(user_chart, use_container_width=True)
-
-st.markdown("---")
+rows = [
+    ("Author", ["Target Group", "Gender"]),
+    ("Book", ["Genre", "Media Type"]),
+    ("CD", ["Age Group", "User Group"]),
+    ("DVD", ["Month", "Library" if len(libraries_selected) > 1 else None]),
+]
+for kind, dimensions in rows:
+    dashboard_row(kind, dimensions, year_selected, paths, years_compared, libraries_selected)
 
+search_section(year_selected, paths, libraries_selected)
 
 # -------------------
-# Row 4 → Place + Time
+# Debug panel (opt-in): stage timings of this rerun. The log file alone does
+# not show the panel, it holds store, warm-up and memory details
 # -------------------
-col10, space, col11, space, col12 = st.columns([1, 0.1, 1.5, 0.1, 1.5])
-
-with col10:
-    st.markdown(
-        f"<div style='color:#363062; font-size:16px; font-weight:bold;'>Top 5 DVDs ({el.format_year(year_selected)})</div>", 
-        unsafe_allow_html=True
-    )
-    st.markdown(
-        f"<div style='color:#6E6E6E; font-size:12px; margin-bottom:12px;'>{el.format_libraries(libraries_selected)}</div>", 
-        unsafe_allow_html=True
-    )
-    for dvd in dvds_list:
-        st.markdown(f"<p style='color:#363062; font-size:14px;'>{dvd}</p>", unsafe_allow_html=True)
-
-with col11:
-    st.markdown(
-        f"<div style='color:#363062; font-size:16px; font-weight:bold;'>Borrowings by Month ({el.format_year(year_selected)})</div>", 
-        unsafe_allow_html=True
-    )
-    st.markdown(
-        f"<div style='color:#6E6E6E; font-size:12px; margin-bottom:12px;'>{el.format_libraries(libraries_selected)}</div>", 
-        unsafe_allow_html=True
-    )
-    st.altair_chart(month_chart, use_container_width=True)
-
-# Show this block only if "All Libraries" is selected
-if choice == "All Libraries":
-    with col12:
-        st.markdown(
-            f"<div style='color:#363062; font-size:16px; font-weight:bold;'>Borrowings by Library ({el.format_year(year_selected)})</div>", 
-            unsafe_allow_html=True
+if PROFILE_LOG:
+    profile.append_to(PROFILE_LOG)
+if debug:
+    with st.sidebar:
+        st.markdown("---")
+        st.header("Debug")
+        st.caption(f"Profiled stages: {profile.total_ms():.1f} ms")
+        st.dataframe(pd.DataFrame(profile.records), hide_index=True)
+        st.json(cache_stats(), expanded=False)
+        st.caption("Shared store per year")
+        st.dataframe(
+            pd.Series(dataset_memory_usage(), name="MB", dtype="float64").div(1024**2).round(1)
         )
-        st.markdown(
-            f"<div style='color:#6E6E6E; font-size:12px; margin-bottom:12px;'>{el.format_libraries(libraries_selected)}</div>", 
-            unsafe_allow_html=True
+        st.json(warmup.status(), expanded=False)
+        if cleaned_df is not None:
+            st.caption(f"Memory of {year_selected} per column")
+            st.dataframe(memory_report(cleaned_df))
+        st.download_button(
+            "Download profile (JSON lines)",
+            profile.to_jsonl(),
+            file_name="rerun_profile.jsonl",
+            mime="application/json",
         )
-        st.altair_chart(library_chart, use_container_width=True)
-
-st.markdown("---")
-
-
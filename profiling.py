@@ -0,0 +1,93 @@
+# profiling.py
+import json
+import os
+import time
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def current_rss():
+    """Resident memory of this process in bytes (Linux), None where unavailable."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class _Stage:
+    __slots__ = ("profile", "name", "rows", "start", "rss")
+
+    def __init__(self, profile, name, rows):
+        self.profile = profile
+        self.name = name
+        self.rows = rows
+
+    def __enter__(self):
+        self.rss = current_rss()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self.start
+        rss = current_rss()
+        self.profile.records.append({
+            "stage": self.name,
+            "ms": round(seconds * 1000, 3),
+            "rows": self.rows,
+            "rss_delta_mb": None if rss is None or self.rss is None
+                            else round((rss - self.rss) / 1024**2, 2),
+            "rss_mb": None if rss is None else round(rss / 1024**2, 1),
+        })
+        return False
+
+
+class _NullStage:
+    """Stand-in when profiling is off: no clock reads, attribute writes ignored."""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __setattr__(self, name, value):
+        pass
+
+
+_NULL_STAGE = _NullStage()
+
+
+class RerunProfile:
+    """Wall time, rows touched and memory delta per stage of one rerun.
+
+    Usage: `with profile.stage("charts", rows=n) as s: ...` (`s.rows` can be
+    set inside the block). When disabled, stage() returns a shared no-op.
+    """
+
+    def __init__(self, enabled: bool = False, context: dict = None):
+        self.enabled = enabled
+        self.context = context or {}
+        self.records = []
+        self.started = time.time()
+
+    def stage(self, name: str, rows: int = None):
+        if not self.enabled:
+            return _NULL_STAGE
+        return _Stage(self, name, rows)
+
+    def total_ms(self) -> float:
+        return round(sum(r["ms"] for r in self.records), 3)
+
+    def to_jsonl(self) -> str:
+        """One JSON object per stage, tagged with the rerun's start time and context."""
+        return "".join(
+            json.dumps({"rerun": self.started, **self.context, **record}) + "\n"
+            for record in self.records
+        )
+
+    def append_to(self, path: str):
+        """Append this rerun's records to a JSON lines file."""
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(self.to_jsonl())
@@ -0,0 +1,229 @@
+# search.py
+# Title and author search: a trigram inverted index over the distinct Title
+# and Author values of one year, plus borrow counts per (Title, Author) pair,
+# library and month. Built once per year, plus one segment per appended
+# month; a query intersects a few posting lists and checks only the
+# surviving candidates.
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from data_loader import MONTH_ORDER
+
+NGRAM = 3
+MONTHS = len(MONTH_ORDER)
+
+
+# --- Trigram inverted index over a list of strings ---
+def _code_points(lowered: list) -> tuple:
+    """Code points of all strings joined by NUL, and the owner of every position."""
+    joined = "\0".join(lowered) + "\0"
+    points = np.frombuffer(joined.encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+    lengths = np.fromiter((len(s) + 1 for s in lowered), dtype=np.int64, count=len(lowered))
+    owners = np.repeat(np.arange(len(lowered), dtype=np.int32), lengths)
+    return points, owners
+
+
+def _gram_keys(points: np.ndarray) -> tuple:
+    """One uint64 key per trigram (three 21-bit code points) and a validity mask."""
+    a, b, c = points[:-2], points[1:-1], points[2:]
+    keys = (a << np.uint64(42)) | (b << np.uint64(21)) | c
+    return keys, (a != 0) & (b != 0) & (c != 0)
+
+
+def build_ngram_index(values) -> dict:
+    """Posting list of string ids per trigram of the lower-cased values."""
+    lowered = [str(value).lower() for value in values]
+    points, owners = _code_points(lowered)
+    keys, valid = _gram_keys(points)
+    keys, ids = keys[valid], owners[:-2][valid]
+
+    order = np.lexsort((ids, keys))
+    keys, ids = keys[order], ids[order]
+    first = np.ones(len(keys), dtype=bool)
+    first[1:] = (keys[1:] != keys[:-1]) | (ids[1:] != ids[:-1])
+    keys, ids = keys[first], ids[first]
+
+    grams, starts = np.unique(keys, return_index=True)
+    return {
+        "grams": grams,
+        "offsets": np.append(starts, len(ids)),
+        "ids": ids,
+        "values": pd.Index(values),
+        "lowered": pa.array(lowered, type=pa.string()),
+    }
+
+
+def lookup(ngram_index: dict, query: str) -> np.ndarray:
+    """Sorted ids of the values containing `query` (case-insensitive)."""
+    query = query.lower()
+    if len(query) < NGRAM:
+        return np.empty(0, dtype=np.int32)
+    points = np.frombuffer(query.encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+    keys = np.unique(_gram_keys(points)[0])
+
+    grams, offsets, ids = ngram_index["grams"], ngram_index["offsets"], ngram_index["ids"]
+    positions = np.searchsorted(grams, keys)
+    if (positions >= len(grams)).any() or (grams[np.minimum(positions, len(grams) - 1)] != keys).any():
+        return np.empty(0, dtype=np.int32)
+
+    # shortest posting lists first, so the candidate set shrinks fast
+    postings = sorted(
+        (ids[offsets[p]:offsets[p + 1]] for p in positions), key=len
+    )
+    candidates = postings[0]
+    for posting in postings[1:]:
+        candidates = np.intersect1d(candidates, posting, assume_unique=True)
+        if not len(candidates):
+            break
+
+    # trigrams can match out of order; confirm the substring on the survivors
+    if len(query) == NGRAM:
+        return candidates
+    found = pc.match_substring(ngram_index["lowered"].take(candidates), query)
+    return candidates[found.to_numpy(zero_copy_only=False)]
+
+
+# --- Search index of one year ---
+def _build(titles, authors, libraries, title_codes, author_codes, lib_codes, months, counts=None):
+    """Aggregate borrowings per (Title, Author) pair × library × month."""
+    months = np.asarray(months, dtype=np.int64)
+    valid = (title_codes >= 0) & (lib_codes >= 0) & (months >= 1) & (months <= MONTHS)
+    title_codes, author_codes = title_codes[valid].astype(np.int64), author_codes[valid].astype(np.int64)
+    lib_codes, months = lib_codes[valid].astype(np.int64), months[valid]
+    weights = None if counts is None else np.asarray(counts)[valid]
+
+    # missing authors become author code -1 in a pair of their own
+    pair_keys = title_codes * (len(authors) + 1) + (author_codes + 1)
+    pair_values, pair_ids = np.unique(pair_keys, return_inverse=True)
+
+    n_libs = len(libraries)
+    cell_keys = (pair_ids * n_libs + lib_codes) * MONTHS + (months - 1)
+    cells, cell_ids = np.unique(cell_keys, return_inverse=True)
+    cell_counts = np.bincount(cell_ids, weights=weights, minlength=len(cells)).astype(np.int64)
+
+    cell_pair = cells // (n_libs * MONTHS)
+    cell_lib = (cells // MONTHS) % n_libs
+    by_library = np.bincount(
+        cell_pair * n_libs + cell_lib, weights=cell_counts, minlength=len(pair_values) * n_libs
+    ).astype(np.int64).reshape(len(pair_values), n_libs)
+
+    return {
+        "titles": build_ngram_index(titles),
+        "authors": build_ngram_index(authors),
+        "libraries": list(libraries),
+        "pair_title": (pair_values // (len(authors) + 1)).astype(np.int32),
+        "pair_author": (pair_values % (len(authors) + 1) - 1).astype(np.int32),
+        "by_library": by_library,
+        "cell_offsets": np.searchsorted(cell_pair, np.arange(len(pair_values) + 1)),
+        "cell_library": cell_lib.astype(np.int8),
+        "cell_month": (cells % MONTHS + 1).astype(np.int8),
+        "cell_count": cell_counts,
+    }
+
+
+def build_search_index(cleaned_df: pd.DataFrame) -> dict:
+    """Search index over the borrowings of a cleaned (compact schema) frame."""
+    borrowings = cleaned_df[cleaned_df["Type of Transaction"] == "A"]
+    title, author, library = borrowings["Title"], borrowings["Author"], borrowings["Library"]
+    return _build(
+        title.cat.categories, author.cat.categories, library.cat.categories,
+        title.cat.codes.to_numpy(), author.cat.codes.to_numpy(),
+        library.cat.codes.to_numpy(), borrowings["Month"].to_numpy(),
+    )
+
+
+def build_search_index_from_counts(counts: pd.DataFrame) -> dict:
+    """Search index from grouped [Title, Author, Library, Month, Count] rows."""
+    codes = {}
+    levels = {}
+    for col in ["Title", "Author", "Library"]:
+        codes[col], levels[col] = pd.factorize(counts[col], sort=True)
+    return _build(
+        levels["Title"], levels["Author"], levels["Library"],
+        codes["Title"], codes["Author"], codes["Library"],
+        counts["Month"].to_numpy(), counts["Count"].to_numpy(),
+    )
+
+
+def _matches(index: dict, query: str) -> np.ndarray:
+    """Pair ids whose title or author contains the query."""
+    titles = lookup(index["titles"], query)
+    authors = lookup(index["authors"], query)
+    hit = np.isin(index["pair_title"], titles) | np.isin(index["pair_author"], authors)
+    return np.flatnonzero(hit)
+
+
+def _hits(index: dict, query: str, libraries: list):
+    """Matching pairs borrowed in the selected libraries, with their per-library counts."""
+    columns = [index["libraries"].index(lib) for lib in libraries if lib in index["libraries"]]
+    pairs = _matches(index, query)
+    per_library = index["by_library"][pairs][:, columns]
+    keep = per_library.sum(axis=1) > 0
+    return pairs[keep], per_library[keep], [index["libraries"][c] for c in columns]
+
+
+def _labels(index: dict, pairs: np.ndarray) -> pd.DataFrame:
+    author_ids = index["pair_author"][pairs]
+    return pd.DataFrame({
+        "Title": index["titles"]["values"][index["pair_title"][pairs]],
+        "Author": np.where(
+            author_ids >= 0, index["authors"]["values"].to_numpy()[np.maximum(author_ids, 0)], None
+        ),
+    })
+
+
+def search(segments: list, query: str, libraries: list, limit: int = 50):
+    """Matching (Title, Author) pairs, most borrowed first, with counts per library.
+
+    `segments` are the search indexes of one year: the initial build plus one
+    per appended month. Returns the top `limit` matches as a frame (Title,
+    Author, Borrowings in the selected libraries, one column per selected
+    library), the number of matches, and the matching pair ids per segment,
+    for search_months.
+    """
+    hits = [_hits(index, query, libraries) for index in segments]
+    matches = [pairs for pairs, _, _ in hits]
+    if len(segments) == 1:
+        (index,), ((pairs, per_library, names),) = segments, hits
+        totals = per_library.sum(axis=1)
+        top = np.argsort(-totals, kind="stable")[:limit]
+        result = _labels(index, pairs[top])
+        result["Borrowings"] = totals[top]
+        for position, name in enumerate(names):
+            result[name] = per_library[top, position]
+        return result, len(pairs), matches
+
+    # a pair can occur in several segments: sum its counts by label
+    frames = []
+    for index, (pairs, per_library, names) in zip(segments, hits):
+        frame = _labels(index, pairs)
+        frame[names] = per_library
+        frames.append(frame)
+    names = [lib for lib in libraries if any(lib in frame for frame in frames)]
+    combined = pd.concat(frames, ignore_index=True).reindex(columns=["Title", "Author", *names])
+    combined = combined.fillna({name: 0 for name in names}).groupby(
+        ["Title", "Author"], dropna=False, sort=False
+    ).sum().astype("int64")
+    combined.insert(0, "Borrowings", combined.sum(axis=1))
+    result = combined.sort_values("Borrowings", ascending=False, kind="stable").head(limit)
+    return result.reset_index(), len(combined), matches
+
+
+def search_months(segments: list, matches: list, libraries: list) -> pd.DataFrame:
+    """Monthly borrowings of the matched pairs in the selected libraries, as [Month, Count]."""
+    counts = np.zeros(MONTHS, dtype=np.int64)
+    for index, pairs in zip(segments, matches):
+        columns = [index["libraries"].index(lib) for lib in libraries if lib in index["libraries"]]
+        # cell positions of all pairs: each pair's run of cells, without a Python loop
+        starts = index["cell_offsets"][pairs]
+        lengths = index["cell_offsets"][pairs + 1] - starts
+        run_starts = np.cumsum(lengths) - lengths
+        cells = np.arange(lengths.sum()) + np.repeat(starts - run_starts, lengths)
+        cells = cells[np.isin(index["cell_library"][cells], columns)]
+        counts += np.bincount(
+            index["cell_month"][cells].astype(np.int64) - 1,
+            weights=index["cell_count"][cells], minlength=MONTHS,
+        ).astype(np.int64)
+    return pd.DataFrame({"Month": np.arange(1, MONTHS + 1, dtype=np.int8), "Count": counts})
@@ -0,0 +1,171 @@
+# snapshot.py
+# Static export of the dashboard: for every year × (all libraries, each single
+# library) the KPIs, the top lists and the Vega-Lite spec of every chart, plus
+# each year's count cube so other library subsets and year comparisons can
+# still be charted. library_app.py serves it with DASHBOARD_SNAPSHOT=<path>
+# without loading any rows (read-only: no preview sample, no search).
+import argparse
+import gzip
+import json
+import os
+import time
+
+import pandas as pd
+
+import elements as el
+from aggregates import (
+    CHART_DIMENSIONS, CUBE_DIMENSIONS, build_count_cube, build_top_index,
+    cube_counts, cube_libraries,
+)
+from store import load_dataset
+
+SNAPSHOT_VERSION = 1
+SNAPSHOT_PATH = "snapshot.json.gz"
+
+# --- Longest top list the dashboard offers; shorter lists are its head ---
+LIST_LENGTH = 20
+LIST_KINDS = ["Author", "Book", "CD", "DVD"]
+
+_snapshots = {}
+
+
+def view_key(libraries: list) -> str:
+    return "|".join(sorted(libraries))
+
+
+# --- Count cube <-> JSON ---
+def _table_to_json(table) -> dict:
+    # levels and codes rather than labels, so level order (and chart order) is kept
+    index = {
+        "levels": [level.tolist() for level in table.index.levels],
+        "codes": [codes.tolist() for codes in table.index.codes],
+        "categorical": [isinstance(level, pd.CategoricalIndex) for level in table.index.levels],
+    }
+    if isinstance(table, pd.Series):
+        return {"index": index, "data": table.tolist()}
+    doc = {"index": index, "columns": table.columns.tolist(), "data": table.to_numpy().tolist()}
+    if isinstance(table.columns, pd.CategoricalIndex):  # e.g. ordered Age Group
+        doc["categories"] = table.columns.categories.tolist()
+        doc["ordered"] = bool(table.columns.ordered)
+    return doc
+
+
+def _table_from_json(doc: dict, name: str = None):
+    levels = [
+        pd.CategoricalIndex(level, categories=level) if categorical else pd.Index(level)
+        for level, categorical in zip(doc["index"]["levels"], doc["index"]["categorical"])
+    ]
+    index = pd.MultiIndex(
+        levels=levels, codes=doc["index"]["codes"], names=["Library", "Type of Transaction"]
+    )
+    if "columns" not in doc:
+        return pd.Series(doc["data"], index=index, dtype="int64")
+    if "categories" in doc:
+        columns = pd.CategoricalIndex(
+            doc["columns"], categories=doc["categories"], ordered=doc["ordered"], name=name
+        )
+    else:
+        columns = pd.Index(doc["columns"], name=name)
+    return pd.DataFrame(doc["data"], index=index, columns=columns, dtype="int64")
+
+
+def cube_to_json(cube: dict) -> dict:
+    doc = {"Year": [int(year) for year in cube["Year"]], "Library": _table_to_json(cube["Library"])}
+    for dim in CUBE_DIMENSIONS:
+        doc[dim] = _table_to_json(cube[dim])
+    return doc
+
+
+def cube_from_json(doc: dict) -> dict:
+    cube = {"Year": doc["Year"], "Library": _table_from_json(doc["Library"])}
+    for dim in CUBE_DIMENSIONS:
+        cube[dim] = _table_from_json(doc[dim], dim)
+    return cube
+
+
+# --- Export ---
+def build_view(cube: dict, top_index: dict, libraries: list) -> dict:
+    """Everything one (year, libraries) view shows, as plain numbers and specs."""
+    num_libraries, borrowings, renewals = el.show_kpis(cube, libraries)
+    dimensions = [d for d in CHART_DIMENSIONS if d != "Library" or len(libraries) > 1]
+    return {
+        "kpis": [int(num_libraries), int(borrowings), int(renewals)],
+        "lists": {kind: el.make_list(top_index, kind, libraries, LIST_LENGTH) for kind in LIST_KINDS},
+        "charts": {
+            dimension: el.make_chart(dimension, cube_counts(cube, dimension, libraries)).to_dict()
+            for dimension in dimensions
+        },
+    }
+
+
+def build_snapshot(files: dict) -> dict:
+    """Snapshot of the given {year: paths} sources."""
+    years = {}
+    for year, paths in sorted(files.items()):
+        print(f"👉 {year}: {', '.join(paths)}")
+        df = load_dataset(year, paths, keep=False)
+        cube, top_index = build_count_cube(df), build_top_index(df)
+        libraries = cube_libraries(cube)
+        selections = [libraries] + [[library] for library in libraries]
+        years[str(year)] = {
+            "cube": cube_to_json(cube),
+            "views": {view_key(sel): build_view(cube, top_index, sel) for sel in selections},
+        }
+        print(f"   {len(df):,} rows, {len(selections)} views")
+    return {"version": SNAPSHOT_VERSION, "created_at": time.time(), "years": years}
+
+
+def write_snapshot(snapshot: dict, path: str = SNAPSHOT_PATH):
+    """Write gzipped JSON next to the target, then move it in place."""
+    tmp = f"{path}.tmp"
+    with gzip.open(tmp, "wt", encoding="utf-8") as f:
+        json.dump(snapshot, f, separators=(",", ":"))
+    os.replace(tmp, path)
+
+
+# --- Serving ---
+def load(path: str = SNAPSHOT_PATH) -> dict:
+    """Read a snapshot once per process; cubes come back as DataFrames."""
+    if path not in _snapshots:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            snapshot = json.load(f)
+        if snapshot.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(f"{path} has snapshot version {snapshot.get('version')}, expected {SNAPSHOT_VERSION}")
+        snapshot["years"] = {
+            int(year): {"cube": cube_from_json(doc["cube"]), "views": doc["views"]}
+            for year, doc in snapshot["years"].items()
+        }
+        _snapshots[path] = snapshot
+    return _snapshots[path]
+
+
+def view(snapshot: dict, year: int, libraries: list):
+    """Precomputed view of a selection, or None if it was not exported."""
+    return snapshot["years"][int(year)]["views"].get(view_key(libraries))
+
+
+def _parse_source(value: str) -> tuple:
+    year, _, paths = value.partition("=")
+    if not paths:
+        raise argparse.ArgumentTypeError(f"expected YEAR=PATH[,PATH...], got {value!r}")
+    return int(year), paths.split(",")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Export KPIs, top lists and chart specs of every year and library."
+    )
+    parser.add_argument(
+        "sources", nargs="+", type=_parse_source, metavar="YEAR=PATH[,PATH...]",
+        help="raw Parquet parts of a year, or an ingest.py dataset directory",
+    )
+    parser.add_argument("--out", default=SNAPSHOT_PATH)
+    args = parser.parse_args()
+
+    missing = [p for _, paths in args.sources for p in paths if not os.path.exists(p)]
+    if missing:
+        print(f"❌ File not found: {', '.join(missing)}")
+    else:
+        write_snapshot(build_snapshot(dict(args.sources)), args.out)
+        print(f"✅ Wrote {args.out} ({os.path.getsize(args.out) / 1024:,.0f} KB)")
+        print("🎉 Done!")
@@ -0,0 +1,181 @@
+# store.py
+import os
+import threading
+from collections import OrderedDict, defaultdict
+
+import pandas as pd
+from aggregates import append_row_index, build_row_index
+from data_loader import append_cleaned, load_and_clean_multiple, load_partitioned
+from disk_cache import load_and_clean_cached
+
+# Copy-on-Write lets every session hold a shallow view of the shared frame:
+# any write through a view copies the touched column instead of changing the
+# shared data (always on from pandas 3.0).
+if int(pd.__version__.split(".")[0]) < 3:
+    pd.set_option("mode.copy_on_write", True)
+
+# --- Memory budget for all cached years (bytes), override via environment ---
+DEFAULT_BUDGET_BYTES = 4 * 1024**3
+_budget = int(os.environ.get("DATASET_BUDGET_BYTES", DEFAULT_BUDGET_BYTES))
+
+# --- One cleaned frame per year and process, shared by all sessions (LRU order).
+# Each entry is (frame, row index): both are replaced together, so offsets
+# read from an entry always match its frame ---
+_datasets = OrderedDict()
+_sizes = {}
+_stats = {"hits": 0, "misses": 0, "evictions": 0}
+_lock = threading.Lock()
+_load_locks = defaultdict(threading.Lock)
+_appended = defaultdict(list)  # batches of monthly files appended per year
+
+
+def _evict(keep):
+    """Drop least recently used years until the store fits the budget (lock held)."""
+    while sum(_sizes.values()) > _budget and len(_datasets) > 1:
+        key = next(k for k in _datasets if k != keep)
+        del _datasets[key]
+        del _sizes[key]
+        _stats["evictions"] += 1
+
+
+def _load(year: int, paths: list) -> pd.DataFrame:
+    """Read a year from an ingest.py dataset directory or from raw Parquet parts."""
+    if len(paths) == 1 and os.path.isdir(paths[0]):
+        return load_partitioned(paths[0], year)
+    return load_and_clean_cached(year, paths)
+
+
+def _put(key, df: pd.DataFrame, row_index: dict):
+    """Publish a frame with its row index (lock held)."""
+    _datasets[key] = (df, row_index)
+    _datasets.move_to_end(key)
+    _sizes[key] = int(df.memory_usage(deep=True).sum())
+    _evict(keep=key)
+
+
+def get_rows(year: int, paths: list) -> tuple:
+    """Read-only view of the cleaned data for one year and its row index.
+
+    Years stay loaded while they fit the memory budget; the least recently used
+    one is evicted first. Callers get a shallow copy, so reading costs nothing
+    and mutating it never reaches the shared frame. The row index
+    (aggregates.build_row_index) always belongs to the returned frame.
+    """
+    key = (int(year), tuple(paths))
+    with _load_locks[key]:
+        with _lock:
+            entry = _datasets.get(key)
+            if entry is not None:
+                _datasets.move_to_end(key)
+                _stats["hits"] += 1
+                return entry[0].copy(deep=False), entry[1]
+            _stats["misses"] += 1
+
+        df = _load(year, list(paths))
+        row_index = build_row_index(df)
+        for files in list(_appended[key]):  # replay appends after an eviction
+            part = load_and_clean_multiple({int(year): files})
+            row_index = append_row_index(row_index, build_row_index(part), len(df))
+            df = append_cleaned(df, part)
+
+        with _lock:
+            _put(key, df, row_index)
+    return df.copy(deep=False), row_index
+
+
+def _keep(key, df: pd.DataFrame, keep):
+    """Publish a year just loaded from its sources, or drop it (see load_dataset).
+
+    A dropped year also loses any older entry, so appends are never replayed
+    onto rows that already hold them.
+    """
+    nbytes = int(df.memory_usage(deep=True).sum())
+    with _lock:
+        _appended[key] = []
+        others = sum(size for k, size in _sizes.items() if k != key)
+        if not (keep or (keep is None and others + nbytes <= _budget)):
+            if _datasets.pop(key, None) is not None:
+                del _sizes[key]
+            return
+    row_index = build_row_index(df)
+    with _lock:
+        _put(key, df, row_index)
+
+
+def load_dataset(year: int, paths: list, keep=None) -> pd.DataFrame:
+    """Cleaned data of a year for building its aggregates (warm-up, snapshot).
+
+    Waits for a load of the year already running and reuses the resident frame.
+    A year loaded here is published for get_rows when `keep` is True or, with
+    `keep=None`, while it fits the memory budget; with `keep=False` (or no room)
+    its rows are dropped once the caller is done with them.
+    """
+    key = (int(year), tuple(paths))
+    with _load_locks[key]:
+        with _lock:
+            entry = _datasets.get(key)
+            if entry is not None and not _appended[key]:
+                return entry[0].copy(deep=False)
+        df = _load(year, list(paths))
+        _keep(key, df, keep)
+    return df.copy(deep=False)
+
+
+def reload_dataset(year: int, paths: list, keep=None) -> pd.DataFrame:
+    """Load a year again from its sources and swap it in once it is ready.
+
+    Until the swap, sessions keep reading the previous frame and row index.
+    A year that was resident stays so; others are kept as in load_dataset.
+    """
+    key = (int(year), tuple(paths))
+    df = _load(year, list(paths))  # outside the load lock: get_rows keeps serving
+    with _lock:
+        resident = key in _datasets
+    _keep(key, df, True if resident else keep)
+    return df.copy(deep=False)
+
+
+def append_dataset(year: int, paths: list, files: list):
+    """Clean only `files` (new months of a year) and append them to its frame.
+
+    Returns the cleaned part for merging the year's aggregates. The year's
+    rows are not cleaned again; the frame and its row index are extended and
+    swapped in together, sessions keep reading the previous pair until then.
+    A year that is not resident only records the files, get_rows adds them
+    when it loads the year.
+    """
+    key = (int(year), tuple(paths))
+    part = load_and_clean_multiple({int(year): list(files)})
+    with _load_locks[key]:
+        with _lock:
+            entry = _datasets.get(key)
+            if entry is None:
+                _appended[key].append(list(files))
+                return part
+        base, row_index = entry
+        row_index = append_row_index(row_index, build_row_index(part), len(base))
+        df = append_cleaned(base, part)
+        with _lock:
+            _put(key, df, row_index)
+            _appended[key].append(list(files))
+    return part
+
+
+def cache_stats() -> dict:
+    """Hit, miss and eviction counters plus current size and budget in bytes."""
+    with _lock:
+        return {
+            **_stats,
+            "years": [year for year, _ in _datasets],
+            "bytes": sum(_sizes.values()),
+            "budget": _budget,
+        }
+
+
+def dataset_memory_usage() -> dict:
+    """Bytes held by the shared store, per year."""
+    with _lock:
+        usage = {}
+        for (year, _), nbytes in _sizes.items():
+            usage[year] = usage.get(year, 0) + nbytes
+        return usage
@@ -0,0 +1,102 @@
+# synthetic_data.py
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from data_loader import (
+    AGE_ORDER, GENDER_TRANSLATION, GENRE_TRANSLATION, LIBRARIES,
+    MEDIA_TYPE_TRANSLATION, RENAME_COLS, TARGET_GROUP_TRANSLATION,
+    USER_GROUP_TRANSLATION,
+)
+
+# --- Source vocabularies (German, as in the Berlin Open Data exports) ---
+MEDIA_TYPES = list(MEDIA_TYPE_TRANSLATION) + ["Nicht bestellbar", "Nicht entleihbar"]
+AGE_GROUPS = AGE_ORDER[:-1] + ["ab 80"]
+TRANSACTIONS = ["A", "T", "F"]
+
+# rough shares: mostly books and borrowings, few excluded rows
+WEIGHTS = {
+    "Ausleihtyp": [0.55, 0.42, 0.03],
+    "Medientypcode": [0.62, 0.04, 0.03, 0.1, 0.01, 0.05, 0.06, 0.005,
+                      0.02, 0.005, 0.02, 0.01, 0.01, 0.01, 0.01],
+}
+
+N_TITLES = 200_000
+N_AUTHORS = 60_000
+CHUNK_ROWS = 1_000_000
+
+
+def _categorical(rng, values, n, weights=None):
+    """Random draw from a vocabulary, built from codes without per-row strings."""
+    p = None if weights is None else np.asarray(weights) / np.sum(weights)
+    return pd.Categorical.from_codes(rng.choice(len(values), size=n, p=p), categories=values)
+
+
+def _zipf_codes(rng, n, vocabulary):
+    """Heavy-tailed codes in [0, vocabulary), like real borrow counts."""
+    return (rng.zipf(1.2, size=n) - 1) % vocabulary
+
+
+TITLES = [f"Titel {i}" for i in range(N_TITLES)]
+AUTHORS = [f"Nachname{i}, Vorname" for i in range(N_AUTHORS)]
+
+
+def make_raw_chunk(n: int, rng: np.random.Generator) -> pd.DataFrame:
+    """n rows with the raw German columns and category vocabularies."""
+    title_codes = _zipf_codes(rng, n, N_TITLES)
+    author_codes = title_codes % N_AUTHORS
+    title_codes[rng.random(n) < 0.01] = -1  # some rows have no title
+
+    columns = {
+        "Ausleihtyp": _categorical(rng, TRANSACTIONS, n, WEIGHTS["Ausleihtyp"]),
+        "Titel": pd.Categorical.from_codes(title_codes, categories=TITLES),
+        "Autor:in": pd.Categorical.from_codes(author_codes, categories=AUTHORS),
+        "Medientypcode": _categorical(rng, MEDIA_TYPES, n, WEIGHTS["Medientypcode"]),
+        "Fächerstatistik": _categorical(rng, list(GENRE_TRANSLATION), n),
+        "Benutzergruppe": _categorical(rng, list(USER_GROUP_TRANSLATION), n),
+        "Geschlecht": _categorical(rng, list(GENDER_TRANSLATION), n),
+        "Altersgruppe": _categorical(rng, AGE_GROUPS, n),
+        "Fächerstatistik2": _categorical(rng, list(TARGET_GROUP_TRANSLATION), n),
+        "Monat": rng.integers(1, 13, size=n),
+        "Sigel besitzende Bibliothek": np.asarray(list(LIBRARIES))[rng.integers(0, len(LIBRARIES), size=n)],
+    }
+    return pd.DataFrame(columns)[list(RENAME_COLS)]
+
+
+def write_synthetic(path: str, rows: int, seed: int = 0, chunk_rows: int = CHUNK_ROWS):
+    """Write a Pankow-shaped Parquet file of `rows` rows, chunk by chunk."""
+    rng = np.random.default_rng(seed)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    writer = None
+    try:
+        for start in range(0, rows, chunk_rows):
+            chunk = make_raw_chunk(min(chunk_rows, rows - start), rng)
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            # store plain strings like the real exports (Parquet still dictionary-encodes them)
+            table = table.cast(pa.schema([
+                pa.field(f.name, pa.string()) if pa.types.is_dictionary(f.type) else f
+                for f in table.schema
+            ])).replace_schema_metadata(None)
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate Pankow-shaped synthetic Parquet data.")
+    parser.add_argument("output")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"👉 Writing {args.rows:,} synthetic rows → {args.output}")
+    write_synthetic(args.output, args.rows, args.seed)
+    print("🎉 Done!")
@@ -0,0 +1,199 @@
+# warmup.py
+# Background warm-up of the per-year state (count cube, top-N and search
+# index). One daemon thread per process builds every year once, WORKERS years
+# at a time, then checks the sources every REFRESH_SECONDS and rebuilds a year
+# off-thread when its files changed. Requests read finished state and never
+# wait for it, except for a year the thread has not reached yet, which waits
+# on the running build instead of starting a second one. New monthly delta
+# files of a year are appended to its state without a rebuild (see start).
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# --- How often sources are re-checked (seconds), override via environment ---
+REFRESH_SECONDS = int(os.environ.get("WARMUP_REFRESH_SECONDS", 600))
+# --- Years built in parallel; each holds its rows in memory while building ---
+WORKERS = int(os.environ.get("WARMUP_WORKERS", 2))
+
+_states = {}
+_status = {}
+_fingerprints = {}
+_applied = {}
+_hooks = {"deltas": None, "append": None}
+_lock = threading.Lock()
+_build_locks = defaultdict(threading.Lock)
+_stop = threading.Event()
+_thread = None
+
+
+def source_fingerprint(year: int, paths: list) -> tuple:
+    """(path, size, mtime) of every source file; directories are walked."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            root = os.path.join(path, f"Year={year}")
+            root = root if os.path.isdir(root) else path
+            for dirpath, _, names in os.walk(root):
+                files.extend(os.path.join(dirpath, name) for name in names)
+        else:
+            files.append(path)
+    fingerprint = []
+    for path in sorted(files):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        fingerprint.append((path, stat.st_size, stat.st_mtime_ns))
+    return tuple(fingerprint)
+
+
+def _build(key, build, reload: bool):
+    """Build one year's state and swap it in (build lock held)."""
+    year, paths = key
+    fingerprint = source_fingerprint(year, paths)
+    with _lock:
+        status = _status.setdefault(key, {"year": year, "state": "pending", "version": 0})
+        status["state"] = "refreshing" if key in _states else "building"
+    start = time.perf_counter()
+    try:
+        state = build(year, list(paths), reload)
+        applied = []
+        if _hooks["deltas"] is not None:
+            applied = list(_hooks["deltas"](year))
+            if applied:
+                state = _hooks["append"](state, year, list(paths), applied)
+    except Exception as exc:
+        logger.exception("Warm-up of %s failed", year)
+        with _lock:
+            status["state"] = "error" if key not in _states else "ready"
+            status["error"] = repr(exc)
+        return _states.get(key)
+
+    with _lock:
+        _states[key] = state
+        _fingerprints[key] = fingerprint
+        _applied[key] = applied
+        status.update(
+            state="ready",
+            version=status["version"] + 1,
+            built_at=time.time(),
+            seconds=round(time.perf_counter() - start, 3),
+            error=None,
+        )
+    return state
+
+
+def _append(key, files: list):
+    """Append new delta files to a built year and swap the state (build lock held)."""
+    year, paths = key
+    start = time.perf_counter()
+    try:
+        state = _hooks["append"](_states[key], year, list(paths), files)
+    except Exception as exc:
+        logger.exception("Appending %s to %s failed", files, year)
+        with _lock:
+            _status[key]["error"] = repr(exc)
+        return
+    with _lock:
+        _states[key] = state
+        _applied[key] = _applied[key] + list(files)
+        status = _status[key]
+        status.update(
+            version=status["version"] + 1,
+            appended_at=time.time(),
+            append_seconds=round(time.perf_counter() - start, 3),
+            error=None,
+        )
+
+
+def get_state(year: int, paths: list, build) -> dict:
+    """Warm state of one year; built here only if the warm-up has not got to it.
+
+    `build(year, paths, reload)` returns the state dict; `reload` is True when
+    the sources changed since the last build.
+    """
+    key = (int(year), tuple(paths))
+    state = _states.get(key)
+    if state is not None:
+        return state
+    with _build_locks[key]:  # waits for a warm-up build already running
+        state = _states.get(key)
+        if state is None:
+            state = _build(key, build, reload=False)
+        if state is None:
+            raise RuntimeError(_status[key]["error"])
+    return state
+
+
+def version(year: int, paths: list) -> int:
+    """Build counter of a year, for keying caches derived from its state."""
+    status = _status.get((int(year), tuple(paths)))
+    return status["version"] if status else 0
+
+
+def applied(year: int, paths: list) -> list:
+    """Delta files appended to the current state of a year."""
+    return list(_applied.get((int(year), tuple(paths)), []))
+
+
+def _check(key, build):
+    """Build, rebuild or append one year as its sources require."""
+    year, paths = key
+    with _build_locks[key]:  # a request may have built it meanwhile
+        if key in _states and _fingerprints.get(key) == source_fingerprint(year, paths):
+            if _hooks["deltas"] is not None:
+                new = [f for f in _hooks["deltas"](year) if f not in _applied[key]]
+                if new:
+                    _append(key, new)
+            return
+        _build(key, build, reload=key in _states)
+
+
+def _run(sources: dict, build, refresh_seconds: int):
+    keys = [(int(year), tuple(paths)) for year, paths in sources.items()]
+    with ThreadPoolExecutor(max_workers=max(1, min(WORKERS, len(keys))),
+                            thread_name_prefix="warmup") as pool:
+        while True:
+            list(pool.map(lambda key: _check(key, build), keys))
+            if _stop.wait(refresh_seconds):
+                return
+
+
+def start(sources: dict, build, refresh_seconds: int = REFRESH_SECONDS,
+          deltas=None, append=None):
+    """Start the warm-up thread once per process; later calls do nothing.
+
+    With `deltas(year)` listing a year's monthly delta files and
+    `append(state, year, paths, files)` returning the state with those files
+    added, new deltas are appended on every check instead of rebuilding the
+    year; a rebuild (changed sources) appends all of them again.
+    """
+    global _thread
+    with _lock:
+        if _thread is not None:
+            return
+        _hooks.update(deltas=deltas, append=append)
+        for year, paths in sources.items():
+            _status.setdefault(
+                (int(year), tuple(paths)), {"year": int(year), "state": "pending", "version": 0}
+            )
+        _thread = threading.Thread(
+            target=_run, args=(sources, build, refresh_seconds), name="warmup", daemon=True
+        )
+        _thread.start()
+
+
+def stop():
+    _stop.set()
+
+
+def status() -> list:
+    """Readiness per year: state, build version, build time and last error."""
+    with _lock:
+        return [dict(s) for s in _status.values()]
+